@@ -1,28 +1,60 @@
-# Display starting message
-print("Script is starting up...")
+# Display starting message (OCR worker processes import this script as __mp_main__ and stay quiet)
+if __name__ == "__main__":
+    print("Script is starting up...")
 
 import os
-import cv2
-import easyocr
+import argparse
+import atexit
+import queue
 import requests
 import logging
 import re
+import select
+import struct
 import unicodedata
 import shutil
-import base64
 import json
+import math
+import csv
+import mimetypes
+import random
 import sys
+import difflib
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+import binascii
+import weakref
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+import logging.handlers
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 from pathlib import Path
 
-# Initialize EasyOCR reader
-reader = easyocr.Reader(['en'])
+script_start_time = time.perf_counter()
+first_card_time = None
+original_upload_bytes = 0
+sent_upload_bytes = 0
+duplicate_images_count = 0
+
+# EasyOCR (and the torch runtime behind it) is only loaded once a Magic card needs it
+reader = None
+reader_lock = threading.Lock()
+# One EasyOCR reader is shared by the whole process, so only one thread runs it at a time
+ocr_lock = threading.Lock()
 
 # Set up logging
 log_file_path = os.path.join('log.txt')
 
 # Configure logging to output to both console and log file
 logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
+logger.setLevel(logging.INFO)
 
 # Create handlers
 file_handler = logging.FileHandler(log_file_path)
@@ -37,9 +69,12 @@ formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 file_handler.setFormatter(formatter)
 console_handler.setFormatter(formatter)
 
-# Add handlers to the logger
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+# Workers only enqueue records; a background listener does the formatting and file writes
+log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
 
 # New variables to count processed files and errors
 magic_processed_count = 0
@@ -47,6 +82,954 @@ pokemon_processed_count = 0
 lorcana_processed_count = 0
 fixed_files_count = 0
 error_files_count = 0
+counter_lock = threading.Lock()
+
+# Serializes collision checks with the renames and moves that depend on them
+file_lock = threading.RLock()
+# Cards this process has renamed in place and not yet moved on, so watch mode can tell them from new drops
+renamed_in_place = set()
+
+def normalized_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
+
+class NameRegistry:
+    # In-memory view of the names taken in each directory, so picking a free "_N" suffix
+    # does not need a filesystem probe per candidate
+    def __init__(self):
+        self.directories = {}
+        self.counters = {}
+        self.lock = threading.RLock()
+        # Set for sharded runs, where other machines write into the same Processed and Error folders
+        self.exclusive = False
+
+    def _names(self, directory):
+        key = os.path.normcase(os.path.abspath(directory))
+        names = self.directories.get(key)
+        if names is None:
+            names = set()
+            if os.path.isdir(directory):
+                with os.scandir(directory) as entries:
+                    names.update(os.path.normcase(entry.name) for entry in entries)
+            self.directories[key] = names
+        return names
+
+    def seed(self, directory, file_names):
+        with self.lock:
+            key = os.path.normcase(os.path.abspath(directory))
+            self.directories[key] = {os.path.normcase(name) for name in file_names}
+
+    def claim(self, directory, stem, extension, current_path=None):
+        with self.lock:
+            names = self._names(directory)
+            candidate = f"{stem}{extension}"
+            if current_path and os.path.normcase(os.path.abspath(current_path)) == os.path.normcase(os.path.abspath(os.path.join(directory, candidate))):
+                return current_path
+            counter_key = (os.path.normcase(os.path.abspath(directory)), os.path.normcase(stem), os.path.normcase(extension))
+            counter = self.counters.get(counter_key, 1)
+            # One stat guards against files created behind our back since the directory was scanned
+            while (os.path.normcase(candidate) in names or os.path.exists(os.path.join(directory, candidate))
+                   or (self.exclusive and not self._reserve(os.path.join(directory, candidate)))):
+                names.add(os.path.normcase(candidate))
+                candidate = f"{stem}_{counter}{extension}"
+                counter += 1
+            self.counters[counter_key] = counter
+            names.add(os.path.normcase(candidate))
+            return os.path.join(directory, candidate)
+
+    def _reserve(self, path):
+        # An empty placeholder created with O_EXCL makes the name ours even if another process
+        # picked the same one; the file is then moved over it with os.replace
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def release(self, path):
+        with self.lock:
+            self._names(os.path.dirname(path)).discard(os.path.normcase(os.path.basename(path)))
+
+    def abandon(self, path):
+        # A claimed name that was never used: drop it and any placeholder reserved for it
+        self.release(path)
+        if self.exclusive:
+            try:
+                if os.path.getsize(path) == 0:
+                    os.remove(path)
+            except OSError:
+                pass
+
+name_registry = NameRegistry()
+
+# Settings read from tcg.cfg, with defaults for anything left out
+DEFAULT_SETTINGS = {
+    'api_base': 'https://api.openai.com/v1',
+    'workers': 4,
+    'requests_per_minute': 500,
+    'tokens_per_minute': 30000,
+    'cache_enabled': True,
+    'cache_file': 'tcg_cache.db',
+    'cache_max_entries': 100000,
+    'cache_max_age_days': 365,
+    'scryfall_api_base': 'https://api.scryfall.com',
+    'scryfall_bulk_file': '',
+    'scryfall_index_file': 'scryfall_index.pkl',
+    'scryfall_match_threshold': 0.8,
+    'pokemon_card_list': '',
+    'lorcana_card_list': '',
+    'card_list_match_threshold': 0.9,
+    'pokemon_recognizers': 'card_list,gpt4o',
+    'magic_recognizers': 'easyocr_scryfall',
+    'lorcana_recognizers': 'card_list,gpt4o',
+    'retry_recognizers': 'gpt4o',
+    'vision_model': 'gpt-4o',
+    'local_vision_api_base': '',
+    'local_vision_model': '',
+    'local_vision_api_key': '',
+    'ocr_mode': 'title',
+    'ocr_batch_size': 8,
+    'ocr_processes': 0,
+    'ocr_threads_per_process': 0,
+    'max_inflight_mb': 256,
+    'upload_max_edge': 1024,
+    'upload_format': 'jpeg',
+    'upload_quality': 85,
+    'image_detail': 'auto',
+    'connect_timeout': 10.0,
+    'read_timeout': 120.0,
+    'max_retries': 5,
+    'backoff_base': 1.0,
+    'backoff_max': 60.0,
+    'circuit_failure_threshold': 5,
+    'circuit_cooldown': 60.0,
+    'batch_mode': False,
+    'batch_wait': True,
+    'batch_state_file': 'batch_state.json',
+    'batch_poll_interval': 60.0,
+    'batch_max_file_mb': 150,
+    'cards_per_request': 1,
+    'watch_settle_seconds': 2.0,
+    'watch_poll_interval': 5.0,
+    'dedup_enabled': False,
+    'dedup_max_distance': 12,
+    'journal_enabled': True,
+    'journal_file': 'tcg_journal.log',
+    'journal_sync_every': 20,
+    'retry_queue_file': 'retry_queue.json',
+    'report_file': 'run_report.json',
+    'prometheus_textfile': '',
+}
+settings = dict(DEFAULT_SETTINGS)
+
+# Magic title bar as fractions of the card (left, top, right, bottom), skipping the mana cost
+TITLE_REGION = (0.06, 0.035, 0.78, 0.105)
+# Where the card name is printed on Pokemon (top left) and Lorcana (banner below the art) cards
+GAME_TITLE_REGIONS = {
+    'magic': TITLE_REGION,
+    'pokemon': (0.08, 0.025, 0.72, 0.095),
+    'lorcana': (0.06, 0.53, 0.94, 0.64),
+}
+TITLE_STRIP_HEIGHT = 64
+TITLE_STRIP_WIDTH = 512
+
+PERCEPTUAL_HASH_SIZE = 16
+
+# Rough per-request token cost used for budgeting before the real usage is known
+VISION_MAX_TOKENS = 300
+ESTIMATED_PROMPT_TOKENS = 60
+ESTIMATED_IMAGE_TOKENS = 765
+
+# Per-stage latency samples, keyed by (stage, game). The game comes from a thread-local that the
+# per-card entry points set, so shared helpers such as encode_image need no extra arguments.
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+stage_samples = defaultdict(list)
+stage_lock = threading.Lock()
+stage_context = threading.local()
+run_started_at = datetime.now(timezone.utc)
+
+def set_current_game(game):
+    stage_context.game = game
+
+def record_stage(stage, seconds):
+    key = (stage, getattr(stage_context, 'game', 'other'))
+    with stage_lock:
+        stage_samples[key].append(seconds)
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+def timed_stage(stage):
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+def stage_statistics():
+    statistics = []
+    with stage_lock:
+        samples = {key: sorted(values) for key, values in stage_samples.items()}
+    for (stage, game), values in sorted(samples.items()):
+        statistics.append({
+            'stage': stage,
+            'game': game,
+            'count': len(values),
+            'total_seconds': sum(values),
+            'mean_seconds': sum(values) / len(values),
+            'p50_seconds': percentile(values, 0.50),
+            'p90_seconds': percentile(values, 0.90),
+            'p99_seconds': percentile(values, 0.99),
+            'max_seconds': values[-1],
+            'buckets': {str(bound): sum(1 for value in values if value <= bound) for bound in LATENCY_BUCKETS},
+        })
+    return statistics
+
+def increment_count(counter_name, amount=1):
+    with counter_lock:
+        globals()[counter_name] += amount
+
+def get_reader():
+    global reader
+    with reader_lock:
+        if reader is None:
+            start = time.perf_counter()
+            print("Loading EasyOCR model...")
+            import easyocr
+            reader = easyocr.Reader(['en'])
+            logging.info(f"EasyOCR reader loaded in {time.perf_counter() - start:.2f}s")
+        return reader
+
+def record_first_card():
+    global first_card_time
+    with counter_lock:
+        if first_card_time is not None:
+            return
+        first_card_time = time.perf_counter() - script_start_time
+    logging.info(f"Time to first card: {first_card_time:.2f}s")
+
+class RateLimiter:
+    # Sliding one-minute window over both request count and token count
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = deque()
+        self.lock = threading.Lock()
+
+    def _purge(self, now):
+        while self.window and now - self.window[0][0] >= 60:
+            self.window.popleft()
+
+    def acquire(self, tokens):
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._purge(now)
+                used_tokens = sum(entry[1] for entry in self.window)
+                if len(self.window) < self.requests_per_minute and used_tokens + tokens <= self.tokens_per_minute:
+                    entry = [now, tokens]
+                    self.window.append(entry)
+                    return entry
+                wait = 60 - (now - self.window[0][0])
+            logging.debug(f"Rate limit budget exhausted, waiting {wait:.1f}s")
+            time.sleep(max(wait, 0.05))
+
+    def record_usage(self, entry, actual_tokens):
+        with self.lock:
+            entry[1] = actual_tokens
+
+rate_limiter = RateLimiter(DEFAULT_SETTINGS['requests_per_minute'], DEFAULT_SETTINGS['tokens_per_minute'])
+
+class MemoryBudget:
+    # Caps the bytes of decoded frames and upload data held by all workers together. A worker that would
+    # go over waits for others to release theirs, and an image larger than the whole budget is let through
+    # once nothing else is held. Workers already holding images charge more with wait=False, so none of
+    # them waits on memory only it can free.
+    def __init__(self, limit_bytes):
+        self.limit = limit_bytes
+        self.used = 0
+        self.peak = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, amount, wait=True):
+        with self.condition:
+            while wait and self.limit > 0 and self.used and self.used + amount > self.limit:
+                self.condition.wait()
+            self.used += amount
+            self.peak = max(self.peak, self.used)
+        return amount
+
+    def release(self, amount):
+        with self.condition:
+            self.used -= amount
+            self.condition.notify_all()
+
+    @contextmanager
+    def hold(self, amount, wait=True):
+        self.acquire(amount, wait)
+        try:
+            yield
+        finally:
+            self.release(amount)
+
+    def attach(self, holder, amount):
+        # Charges memory that is already allocated to the object holding it, until that object is freed
+        self.acquire(amount, wait=False)
+        weakref.finalize(holder, self.release, amount)
+        return holder
+
+memory_budget = MemoryBudget(DEFAULT_SETTINGS['max_inflight_mb'] * 1048576)
+
+class CircuitBreaker:
+    # Pauses every caller for a host after repeated failures, then lets a single probe through
+    def __init__(self, host, failure_threshold, cooldown):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0
+        self.probing = False
+        self.condition = threading.Condition()
+
+    def wait(self):
+        # Returns True for the one caller let through as the probe
+        with self.condition:
+            while self.failures >= self.failure_threshold:
+                now = time.monotonic()
+                if now >= self.open_until and not self.probing:
+                    self.probing = True
+                    return True
+                self.condition.wait(timeout=1.0 if self.probing else max(0.1, self.open_until - now))
+            return False
+
+    def release_probe(self):
+        # The probe ended without telling whether the host is healthy (a 429 or an unexpected error),
+        # so the next caller gets to probe instead
+        with self.condition:
+            self.probing = False
+            self.condition.notify_all()
+
+    def record_success(self):
+        with self.condition:
+            if self.failures >= self.failure_threshold:
+                logging.info(f"{self.host} is responding again, resuming")
+            self.failures = 0
+            self.probing = False
+            self.condition.notify_all()
+
+    def record_failure(self):
+        with self.condition:
+            self.failures += 1
+            was_probing = self.probing
+            self.probing = False
+            if self.failures < self.failure_threshold:
+                return False
+            self.open_until = time.monotonic() + self.cooldown
+            if was_probing or self.failures == self.failure_threshold:
+                message = f"{self.host} appears to be down, pausing requests for {self.cooldown:.0f}s"
+                print(message)
+                logging.warning(message)
+            self.condition.notify_all()
+            return True
+
+http_session = None
+circuit_breakers = {}
+http_lock = threading.Lock()
+
+class IdentificationCache:
+    # Remembers identified cards by a hash of the image bytes so repeats skip OCR and the API
+    def __init__(self, path, max_entries, max_age_days):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cards ("
+            "image_hash TEXT PRIMARY KEY, name TEXT NOT NULL, series TEXT NOT NULL, "
+            "backend TEXT NOT NULL, identified_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.commit()
+        self.evict()
+
+    def get(self, image_hash, require_series=False, series_optional_backends=()):
+        # Entries without a series only count when the caller accepts them, or when they came from a
+        # backend that never knows one
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT name, series, identified_at, backend FROM cards WHERE image_hash = ?", (image_hash,)
+            ).fetchone()
+            now = time.time()
+            if row and now - row[2] <= self.max_age_seconds and (row[1] or not require_series or row[3] in series_optional_backends):
+                self.connection.execute("UPDATE cards SET last_used = ? WHERE image_hash = ?", (now, image_hash))
+                self.connection.commit()
+                self.hits += 1
+                return row[0], row[1]
+            self.misses += 1
+            return None
+
+    def put(self, image_hash, name, series, backend):
+        with self.lock:
+            now = time.time()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO cards (image_hash, name, series, backend, identified_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (image_hash, name, series or '', backend, now, now),
+            )
+            self.connection.commit()
+
+    def evict(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM cards WHERE identified_at < ?", (time.time() - self.max_age_seconds,))
+            self.connection.execute(
+                "DELETE FROM cards WHERE image_hash IN "
+                "(SELECT image_hash FROM cards ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.connection.commit()
+
+    def close(self):
+        self.evict()
+        with self.lock:
+            self.connection.close()
+
+identification_cache = None
+
+def open_identification_cache():
+    global identification_cache
+    if not settings['cache_enabled']:
+        return
+    try:
+        identification_cache = IdentificationCache(settings['cache_file'], settings['cache_max_entries'], settings['cache_max_age_days'])
+    except sqlite3.Error as e:
+        logging.error(f"Could not open identification cache '{settings['cache_file']}': {e}")
+
+def close_identification_cache():
+    global identification_cache
+    if identification_cache is not None:
+        identification_cache.close()
+        identification_cache = None
+
+def print_cache_stats():
+    if identification_cache is None:
+        return
+    message = f"Identification cache: {identification_cache.hits} hits, {identification_cache.misses} misses"
+    print(message)
+    logging.info(message)
+
+def hash_image(image_path):
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as image_file:
+        for chunk in iter(lambda: image_file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cached_identification(image_path, require_series=False, series_optional_backends=()):
+    if identification_cache is None:
+        return None, None
+    try:
+        image_hash = hash_image(image_path)
+    except OSError as e:
+        logging.error(f"Could not hash image {image_path}: {e}")
+        return None, None
+    cached = identification_cache.get(image_hash, require_series, series_optional_backends)
+    if cached:
+        logging.info(f"Cache hit for {image_path}: {cached[0]}")
+    return image_hash, cached
+
+def card_file_name(name, series):
+    return f"{name} - {series}" if series else name
+
+def remember_identification(image_hash, name, series, backend, image_path=None):
+    if identification_cache is not None and image_hash:
+        identification_cache.put(image_hash, name, series, backend)
+    if operation_journal is not None and image_path:
+        operation_journal.append({'op': 'identified', 'path': image_path, 'card_name': card_file_name(name, series)})
+
+class OperationJournal:
+    # Append-only log of identifications and planned rename/move operations. Records are written
+    # immediately and fsynced every sync_every records, so a crash loses at most one batch.
+    def __init__(self, path, sync_every):
+        self.path = path
+        self.sync_every = max(1, sync_every)
+        self.unsynced = 0
+        self.records = 0
+        self.next_id = 0
+        self.run_id = f"{int(time.time())}-{os.getpid()}"
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def append(self, record):
+        with self.lock:
+            if record.get('op') == 'plan':
+                self.next_id += 1
+                record['id'] = f"{self.run_id}-{self.next_id}"
+            self.file.write(json.dumps(record) + '\n')
+            self.file.flush()
+            self.records += 1
+            self.unsynced += 1
+            if self.unsynced >= self.sync_every:
+                os.fsync(self.file.fileno())
+                self.unsynced = 0
+            return record.get('id')
+
+    def truncate(self):
+        # Only for when no operation is open, i.e. every plan has its 'done' record
+        with self.lock:
+            if not self.records:
+                return
+            self.file.seek(0)
+            self.file.truncate()
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.records = 0
+            self.unsynced = 0
+    
+    def close(self, truncate=True):
+        with self.lock:
+            self.file.close()
+            if truncate:
+                # Everything has been applied, so start the next run with an empty journal
+                open(self.path, 'w').close()
+
+operation_journal = None
+
+def read_journal(path):
+    records = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A torn final line from a crash carries no usable information
+                continue
+    return records
+
+def recover_journal():
+    path = settings['journal_file']
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    plans = {}
+    identified = {}
+    for record in read_journal(path):
+        op = record.get('op')
+        if op == 'identified':
+            identified[record['path']] = record
+        elif op == 'plan':
+            identified.pop(record['source'], None)
+            plans[record['id']] = record
+        elif op == 'renamed' and record.get('id') in plans:
+            plans[record['id']]['renamed'] = record['path']
+        elif op == 'done':
+            plans.pop(record.get('id'), None)
+    if not plans and not identified:
+        return
+    
+    message = f"Resuming {len(plans)} interrupted file operations and {len(identified)} identified cards from the journal"
+    print(message)
+    logging.info(message)
+    for plan in plans.values():
+        renamed = plan.get('renamed')
+        if renamed and os.path.exists(renamed):
+            move_file(renamed, plan['processed'])
+        elif os.path.exists(plan['source']):
+            file_identified_card(plan['source'], plan['card_name'], plan['processed'], plan['error'])
+    for record in identified.values():
+        if os.path.exists(record['path']):
+            root = os.path.dirname(record['path'])
+            if os.path.basename(root) == 'Error':
+                root = os.path.dirname(root)
+            file_identified_card(record['path'], record['card_name'], os.path.join(root, 'Processed'), os.path.join(root, 'Error'))
+
+def open_operation_journal():
+    global operation_journal
+    if not settings['journal_enabled']:
+        return
+    recover_journal()
+    # Recovered operations have been applied, so this run starts from an empty journal
+    open(settings['journal_file'], 'w').close()
+    operation_journal = OperationJournal(settings['journal_file'], settings['journal_sync_every'])
+
+def close_operation_journal():
+    global operation_journal
+    if operation_journal is not None:
+        operation_journal.close(truncate=True)
+        operation_journal = None
+
+# Files that end up in an Error folder are queued with the reason they failed. Each reason has its
+# own backoff and attempt cap, so a network blip is retried soon while an image that cannot be
+# decoded is never sent again.
+RETRY_POLICIES = {
+    # reason: (delay before the first retry in seconds, retries before giving up)
+    'network': (300, 8),
+    'rate_limit': (900, 8),
+    'parse': (3600, 3),
+    'not_found': (86400, 2),
+    'ocr': (600, 5),
+    'unreadable': (0, 0),
+}
+RETRY_MAX_DELAY = 7 * 86400
+
+def classify_status(status_code):
+    if status_code == 429:
+        return 'rate_limit'
+    if status_code == 404:
+        return 'not_found'
+    return 'network'
+
+def classify_exception(error):
+    response = getattr(error, 'response', None)
+    if isinstance(error, requests.HTTPError) and response is not None:
+        return classify_status(response.status_code)
+    if isinstance(error, requests.RequestException):
+        return 'network'
+    if isinstance(error, (KeyError, ValueError, TypeError)):
+        return 'parse'
+    if isinstance(error, OSError):
+        return 'unreadable'
+    return 'parse'
+
+class RetryQueue:
+    # Keyed by the file's normalized absolute path in its Error folder, so runs started from another
+    # working directory find the same entries; size and mtime detect a file that was replaced
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.changed = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as file:
+                    entries = json.load(file)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Could not read retry queue '{path}', starting a new one: {e}")
+            else:
+                # Queues written before keys were normalized hold paths relative to that run's directory
+                for image_path, entry in entries.items():
+                    entry.setdefault('path', os.path.abspath(image_path))
+                    self.entries[normalized_path(image_path)] = entry
+                self.changed = any(key != normalized_path(key) for key in entries)
+    
+    def record_failure(self, image_path, reason):
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return
+        now = time.time()
+        key = normalized_path(image_path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime:
+                entry = {'path': os.path.abspath(image_path), 'attempts': 0, 'size': stat.st_size, 'mtime': stat.st_mtime}
+            entry['attempts'] += 1
+            entry['reason'] = reason
+            entry['last_attempt'] = now
+            delay, _ = RETRY_POLICIES[reason]
+            entry['next_attempt'] = now + min(RETRY_MAX_DELAY, delay * 2 ** (entry['attempts'] - 1))
+            self.entries[key] = entry
+            self.changed = True
+        logging.info(f"Queued {image_path} for retry: {reason}, attempt {entry['attempts']}")
+    
+    def forget(self, image_path):
+        with self.lock:
+            if self.entries.pop(normalized_path(image_path), None) is not None:
+                self.changed = True
+    
+    def due(self, directory=None):
+        # Entries whose file has gone (moved by hand, fixed elsewhere) are dropped along the way
+        now = time.time()
+        prefix = os.path.join(normalized_path(directory), '') if directory else ''
+        due = []
+        with self.lock:
+            for key, entry in list(self.entries.items()):
+                if not os.path.exists(entry['path']):
+                    del self.entries[key]
+                    self.changed = True
+                    continue
+                _, max_retries = RETRY_POLICIES.get(entry['reason'], (0, 0))
+                if key.startswith(prefix) and entry['attempts'] <= max_retries and entry['next_attempt'] <= now:
+                    due.append(entry['path'])
+        return due
+    
+    def adopt_error_folders(self, directories):
+        # Files already sitting in Error folders when the queue is first created get one retry
+        for directory in directories:
+            for root, dirs, files in os.walk(directory):
+                if os.path.basename(root) != 'Error':
+                    continue
+                for file in files:
+                    image_path = os.path.join(root, file)
+                    if (file.lower().endswith(IMAGE_EXTENSIONS) and normalized_path(image_path) not in self.entries
+                            and (shard is None or shard.owns(directory, image_path))):
+                        stat = os.stat(image_path)
+                        self.entries[normalized_path(image_path)] = {
+                            'path': os.path.abspath(image_path), 'attempts': 0, 'size': stat.st_size, 'mtime': stat.st_mtime,
+                            'reason': 'network', 'last_attempt': 0, 'next_attempt': 0}
+                        self.changed = True
+    
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+            temporary_file = f"{self.path}.tmp"
+            with open(temporary_file, 'w') as file:
+                json.dump(self.entries, file, indent=1)
+            os.replace(temporary_file, self.path)
+            self.changed = False
+    
+    def summary(self):
+        with self.lock:
+            return Counter(entry['reason'] for entry in self.entries.values())
+
+retry_queue = None
+
+def open_retry_queue(game_folders):
+    global retry_queue
+    is_new = not os.path.exists(settings['retry_queue_file'])
+    retry_queue = RetryQueue(settings['retry_queue_file'])
+    if is_new:
+        retry_queue.adopt_error_folders([folder for folder in game_folders if os.path.exists(folder)])
+
+def close_retry_queue():
+    global retry_queue
+    if retry_queue is not None:
+        try:
+            retry_queue.save()
+        except OSError as e:
+            logging.error(f"Could not save retry queue: {e}")
+        retry_queue = None
+
+def normalize_card_name(text):
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r'[^a-z0-9 ]', ' ', text.replace('&', 'and'))
+    return ' '.join(text.split())
+
+def name_trigrams(normalized_name):
+    padded = f"  {normalized_name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NameIndex:
+    # Trigram index over normalized card names for fast local fuzzy matching
+    VERSION = 1
+
+    def __init__(self, entries, source_signature=None):
+        # entries maps an alias (e.g. a single face of a double-faced card) to the canonical name
+        self.source_signature = source_signature
+        self.names = []
+        self.canonical = []
+        self.exact = {}
+        self.trigrams = {}
+        for alias, canonical_name in entries:
+            normalized = normalize_card_name(alias)
+            if not normalized or normalized in self.exact:
+                continue
+            entry_id = len(self.names)
+            self.names.append(normalized)
+            self.canonical.append(canonical_name)
+            self.exact[normalized] = entry_id
+            for trigram in name_trigrams(normalized):
+                self.trigrams.setdefault(trigram, []).append(entry_id)
+
+    def lookup(self, text, candidates=25):
+        normalized = normalize_card_name(text)
+        if not normalized:
+            return None, 0.0
+        entry_id = self.exact.get(normalized)
+        if entry_id is not None:
+            return self.canonical[entry_id], 1.0
+        
+        shared = Counter()
+        for trigram in name_trigrams(normalized):
+            shared.update(self.trigrams.get(trigram, ()))
+        best_name, best_score = None, 0.0
+        for entry_id, _ in shared.most_common(candidates):
+            score = difflib.SequenceMatcher(None, normalized, self.names[entry_id]).ratio()
+            if score > best_score:
+                best_name, best_score = self.canonical[entry_id], score
+        return best_name, best_score
+
+    def save(self, path):
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'wb') as index_file:
+            pickle.dump((self.VERSION, self.__dict__), index_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path, source_signature):
+        with open(path, 'rb') as index_file:
+            version, state = pickle.load(index_file)
+        if version != cls.VERSION or state.get('source_signature') != source_signature:
+            return None
+        index = cls.__new__(cls)
+        index.__dict__.update(state)
+        return index
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+def scryfall_bulk_entries(bulk_file):
+    with open(bulk_file, 'r', encoding='utf-8') as file:
+        cards = json.load(file)
+    for card in cards:
+        name = card.get('name')
+        if not name:
+            continue
+        yield name, name
+        for face in card.get('card_faces') or []:
+            if face.get('name'):
+                yield face['name'], name
+
+scryfall_index = None
+scryfall_index_lock = threading.Lock()
+scryfall_local_matches = 0
+scryfall_online_lookups = 0
+
+def load_name_index(source_file, index_file, build_entries, label):
+    # Reuses the pickled index while the source file is unchanged, otherwise rebuilds and saves it
+    try:
+        signature = file_signature(source_file)
+    except OSError as e:
+        logging.error(f"{label} file '{source_file}' is unavailable: {e}")
+        return None
+    index = None
+    if os.path.exists(index_file):
+        try:
+            index = NameIndex.load(index_file, signature)
+        except Exception as e:
+            logging.warning(f"Could not load {label} index '{index_file}', rebuilding: {e}")
+    if index is None:
+        start = time.perf_counter()
+        print(f"Building local {label} index...")
+        try:
+            index = NameIndex(build_entries(source_file), signature)
+        except (OSError, ValueError, csv.Error) as e:
+            logging.error(f"Could not read {label} file '{source_file}': {e}")
+            return None
+        try:
+            index.save(index_file)
+        except OSError as e:
+            logging.warning(f"Could not save {label} index '{index_file}': {e}")
+        logging.info(f"Built {label} index of {len(index.names)} names in {time.perf_counter() - start:.1f}s")
+    return index
+
+def get_scryfall_index():
+    global scryfall_index
+    bulk_file = settings['scryfall_bulk_file']
+    if not bulk_file:
+        return None
+    with scryfall_index_lock:
+        if scryfall_index is None:
+            scryfall_index = load_name_index(bulk_file, settings['scryfall_index_file'], scryfall_bulk_entries, 'Scryfall') or False
+            if not scryfall_index:
+                logging.error("Using the online Scryfall API instead of the bulk file")
+        return scryfall_index or None
+
+def resolve_card_name_locally(card_text):
+    global scryfall_local_matches
+    index = get_scryfall_index()
+    if index is None:
+        return None
+    card_name, score = index.lookup(card_text)
+    if card_name and score >= settings['scryfall_match_threshold']:
+        with counter_lock:
+            scryfall_local_matches += 1
+        logging.debug(f"Resolved '{card_text}' locally to '{card_name}' (score {score:.2f})")
+        return card_name
+    return None
+
+def card_list_field(record, keys):
+    for key in keys:
+        value = record.get(key)
+        if isinstance(value, dict):
+            value = value.get('name')
+        if value:
+            return str(value).strip()
+    return ''
+
+def card_list_entries(card_list_file):
+    # Accepts a JSON list (optionally under "data" or "cards") of names or objects, or a CSV file with a
+    # header row. Names map to every series they were printed in.
+    with open(card_list_file, 'r', encoding='utf-8-sig', newline='') as file:
+        if card_list_file.lower().endswith('.csv'):
+            records = list(csv.DictReader(file))
+        else:
+            records = json.load(file)
+            if isinstance(records, dict):
+                records = records.get('data') or records.get('cards') or []
+    series_by_name = {}
+    for record in records:
+        if isinstance(record, str):
+            name, series = record.strip(), ''
+        elif isinstance(record, dict):
+            record = {str(key).lower(): value for key, value in record.items()}
+            name = card_list_field(record, ['name', 'card_name', 'title'])
+            series = card_list_field(record, ['series', 'set_name', 'set', 'expansion'])
+        else:
+            continue
+        if name:
+            series_by_name.setdefault(name, [])
+            if series and series not in series_by_name[name]:
+                series_by_name[name].append(series)
+    for name, series in series_by_name.items():
+        yield name, (name, tuple(series))
+
+card_list_indexes = {}
+card_list_lock = threading.Lock()
+
+def get_card_list_index(game):
+    card_list_file = settings.get(f"{game}_card_list")
+    if not card_list_file:
+        return None
+    with card_list_lock:
+        if game not in card_list_indexes:
+            card_list_indexes[game] = load_name_index(card_list_file, f"{game}_card_index.pkl", card_list_entries, f"{game.capitalize()} card list")
+        return card_list_indexes[game]
+
+def choose_series(series_options, folder):
+    # A name printed in several series is only accepted when the set folder says which one.
+    # Lists without series (plain names) file the card under its name alone.
+    if not series_options:
+        return ''
+    if len(series_options) == 1:
+        return series_options[0]
+    folder_name = normalize_card_name(os.path.basename(folder))
+    matches = [series for series in series_options if normalize_card_name(series) == folder_name]
+    return matches[0] if len(matches) == 1 else None
+
+def identify_cards_locally(image_paths, game):
+    # Title-line OCR against the user's card list; returns {image_path: (name, series)} for confident matches only
+    index = get_card_list_index(game)
+    if index is None or not image_paths:
+        return {}
+    region = GAME_TITLE_REGIONS[game]
+    texts = recognize_regions(image_paths, [load_ocr_region(image_path, 'title', region) for image_path in image_paths], 'title')
+    identified = {}
+    for image_path, text in zip(image_paths, texts):
+        match, score = index.lookup(text or '')
+        series = choose_series(match[1], os.path.dirname(image_path)) if match and score >= settings['card_list_match_threshold'] else None
+        if series is None:
+            logging.debug(f"No confident local match for {image_path}: '{text}' (score {score:.2f})")
+            continue
+        identified[image_path] = (match[0], series)
+        logging.info(f"Identified '{card_file_name(match[0], series)}' for {image_path} from the card list (score {score:.2f})")
+    return identified
 
 def sanitize_filename(name):
     name = name.replace('&', 'and')
@@ -55,142 +1038,618 @@ def sanitize_filename(name):
     sanitized_name = re.sub(r'[^a-zA-Z0-9 \-\.]', '', sanitized_name)
     return sanitized_name
 
-def preprocess_file_names(directory):
-    for root, dirs, files in os.walk(directory):
-        dirs[:] = [d for d in dirs if d not in ['Processed', 'Error']]
-        for file in files:
-            if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')):
-                original_path = os.path.join(root, file)
-                directory = os.path.dirname(original_path)
-                file_extension = os.path.splitext(original_path)[1]
-                sanitized_name = sanitize_filename(os.path.splitext(file)[0])
-                new_file_name = f"{sanitized_name}{file_extension}"
-                new_file_path = os.path.join(directory, new_file_name)
-                
-                counter = 1
-                while os.path.exists(new_file_path):
-                    new_file_name = f"{sanitized_name}_{counter}{file_extension}"
-                    new_file_path = os.path.join(directory, new_file_name)
-                    counter += 1
-                
-                if original_path != new_file_path:
-                    os.rename(original_path, new_file_path)
-                    logging.info(f"Preprocessed {original_path} to {new_file_path}")
+# Sharding: with --shard i/N, each of N processes (on one machine or several sharing the card folders)
+# only takes the images whose stable hash falls in its slice
+class Shard:
+    def __init__(self, index, count, key='path'):
+        self.index = index
+        self.count = count
+        self.key = key
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+    def path_key(self, directory, image_path):
+        # Relative to the game folder so every machine agrees whatever the mount point, and based on
+        # the name preprocessing gives the file, so the owner renaming it does not move it to another shard.
+        # Preprocessing appends NameRegistry's "_N" when the sanitized name is taken, so a "_N" suffix is
+        # dropped (before sanitizing, which would remove the underscore) when the name it was added to is
+        # there; camera names like IMG_0001 keep their number and spread across the shards.
+        folder = os.path.relpath(os.path.dirname(image_path), directory)
+        stem, extension = os.path.splitext(os.path.basename(image_path))
+        match = re.fullmatch(r'(.+)_\d+', stem)
+        if match and os.path.exists(os.path.join(os.path.dirname(image_path), match.group(1) + extension)):
+            stem = match.group(1)
+        return '/'.join(Path(folder).parts + (sanitize_filename(stem) + extension,)).lower()
+
+    def owns(self, directory, image_path):
+        digest = None
+        if self.key == 'content':
+            try:
+                digest = hash_image(image_path)
+            except OSError as e:
+                logging.warning(f"Could not read {image_path} for sharding, using its path instead: {e}")
+        if digest is None:
+            digest = hashlib.sha256(self.path_key(directory, image_path).encode('utf-8')).hexdigest()
+        return int(digest[:16], 16) % self.count == self.index
+
+    def file_name(self, path):
+        # Per-shard name for state files such as the journal, so shards sharing a working folder
+        # never write to the same file
+        base, extension = os.path.splitext(path)
+        return f"{base}.shard-{self.index}-of-{self.count}{extension}"
+
+shard = None
+
+def parse_shard(value):
+    match = re.fullmatch(r'(\d+)/(\d+)', value)
+    if not match or not 0 <= int(match.group(1)) < int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"expected i/N with 0 <= i < N, got '{value}'")
+    return int(match.group(1)), int(match.group(2))
+
+def shard_manifest(directory, manifest):
+    if shard is None:
+        return manifest
+    total = owned = 0
+    for folder, files in manifest.items():
+        total += len(files)
+        manifest[folder] = [file for file in files if shard.owns(directory, os.path.join(folder, file))]
+        owned += len(manifest[folder])
+    logging.info(f"Shard {shard} takes {owned} of {total} images in {directory}")
+    return manifest
+
+def scan_game_directory(directory):
+    # Single pass over a game folder: returns {folder: [pending image names]} and records every
+    # existing name (including Processed and Error) in the name registry
+    manifest = {}
+    pending = [directory]
+    while pending:
+        root = pending.pop()
+        names = []
+        images = []
+        subdirectories = []
+        with os.scandir(root) as entries:
+            for entry in entries:
+                names.append(entry.name)
+                if entry.is_dir():
+                    if entry.name in ['Processed', 'Error']:
+                        with os.scandir(entry.path) as target_entries:
+                            name_registry.seed(entry.path, [target.name for target in target_entries])
+                    else:
+                        subdirectories.append(entry.path)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append(entry.name)
+        name_registry.seed(root, names)
+        manifest[root] = sorted(images)
+        pending.extend(sorted(subdirectories, reverse=True))
+    return manifest
+
+def preprocess_file_names(directory, manifest=None):
+    if manifest is None:
+        manifest = scan_game_directory(directory)
+    for root, files in manifest.items():
+        for position, file in enumerate(files):
+            files[position] = preprocess_file(root, file)
+    return manifest
+
+def preprocess_file(root, file):
+    original_path = os.path.join(root, file)
+    file_extension = os.path.splitext(file)[1]
+    sanitized_name = sanitize_filename(os.path.splitext(file)[0])
+    with file_lock:
+        new_file_path = name_registry.claim(root, sanitized_name, file_extension, current_path=original_path)
+        if original_path != new_file_path:
+            try:
+                os.replace(original_path, new_file_path)
+            except OSError:
+                name_registry.abandon(new_file_path)
+                raise
+            name_registry.release(original_path)
+            logging.info(f"Preprocessed {original_path} to {new_file_path}")
+    return os.path.basename(new_file_path)
 
-def get_card_name(image_path):
+def image_dimensions(image_path):
+    # Width and height from a PNG or JPEG header, without decoding; None for other formats
     try:
-        image = cv2.imread(image_path)
+        with open(image_path, 'rb') as image_file:
+            header = image_file.read(24)
+            if header.startswith(b'\x89PNG\r\n\x1a\n') and header[12:16] == b'IHDR':
+                return struct.unpack('>II', header[16:24])
+            if not header.startswith(b'\xff\xd8'):
+                return None
+            image_file.seek(2)
+            while True:
+                marker = image_file.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                code = marker[1]
+                while code == 0xFF:
+                    code = image_file.read(1)[0]
+                if code == 0x01 or 0xD0 <= code <= 0xD8:
+                    continue
+                segment_length = struct.unpack('>H', image_file.read(2))[0]
+                # Start-of-frame markers; C4, C8 and CC are tables that share the range
+                if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>xHH', image_file.read(5))
+                    return width, height
+                image_file.seek(segment_length - 2, os.SEEK_CUR)
+    except (OSError, struct.error, IndexError):
+        return None
+
+def decoded_size(image_path, dimensions=None, reduction=1):
+    # Bytes of the BGR frame cv2.imread will produce, for the memory budget
+    dimensions = dimensions or image_dimensions(image_path)
+    if dimensions is None:
+        # Unknown format: assume the ratio of a typically compressed scan
+        try:
+            return os.path.getsize(image_path) * 10
+        except OSError:
+            return 0
+    width, height = dimensions
+    return (width // reduction + 1) * (height // reduction + 1) * 3
+
+def find_card_bounds(image):
+    import cv2
+    height, width = image.shape[:2]
+    scale = min(1.0, 400 / max(height, width))
+    small = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 50, 150)
+    edges = cv2.dilate(edges, None, iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if contours:
+        x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+        if w * h >= 0.3 * small.shape[0] * small.shape[1]:
+            return int(x / scale), int(y / scale), int(w / scale), int(h / scale)
+    return 0, 0, width, height
+
+def crop_title_region(image, region=TITLE_REGION):
+    import cv2
+    x, y, width, height = find_card_bounds(image)
+    left, top, right, bottom = region
+    strip = image[y + int(height * top):y + int(height * bottom), x + int(width * left):x + int(width * right)]
+    if strip.size == 0:
+        return None
+    strip = cv2.cvtColor(strip, cv2.COLOR_BGR2GRAY)
+    scale = TITLE_STRIP_HEIGHT / strip.shape[0]
+    return cv2.resize(strip, (max(1, int(strip.shape[1] * scale)), TITLE_STRIP_HEIGHT), interpolation=cv2.INTER_AREA)
+
+def load_ocr_region(image_path, ocr_mode, region=TITLE_REGION, wait=True):
+    # The full frame only lives until the title strip is cropped out of it; a full-mode frame
+    # stays charged to the memory budget until OCR is done with it
+    import cv2
+    with memory_budget.hold(decoded_size(image_path), wait):
+        with timed('decode_image'):
+            image = cv2.imread(image_path)
         if image is None:
-            raise ValueError(f"Could not read image: {image_path}")
-        
-        result = reader.readtext(image, detail=0)
-        
-        card_text = result[0] if result else ''
-        
-        logging.debug(f"Extracted text from {image_path}: {card_text}")
-        
-        response = requests.get(f'https://api.scryfall.com/cards/named?fuzzy={card_text}')
-        
-        if response.status_code == 200:
-            card_data = response.json()
-            card_name = card_data['name']
-            logging.info(f"Identified card '{card_name}' for image {image_path}")
-            return card_name
-        else:
-            logging.warning(f"Card not found for text: {card_text} in image {image_path}")
+            logging.error(f"Error processing image {image_path}: Could not read image: {image_path}")
             return None
-    except Exception as e:
-        logging.error(f"Error processing image {image_path}: {e}")
+        with timed('crop_title'):
+            title = crop_title_region(image, region) if ocr_mode == 'title' else None
+        if title is not None:
+            return title
+        return memory_budget.attach(image, image.nbytes)
+
+def extract_card_texts(image_paths, ocr_mode=None):
+    ocr_mode = ocr_mode or settings['ocr_mode']
+    return recognize_regions(image_paths, [load_ocr_region(image_path, ocr_mode, wait=position == 0)
+                                           for position, image_path in enumerate(image_paths)], ocr_mode)
+
+def recognize_regions(image_paths, loaded_regions, ocr_mode):
+    import cv2
+    texts = [None] * len(image_paths)
+    regions = [(position, region) for position, region in enumerate(loaded_regions) if region is not None]
+    if not regions:
+        return texts
+    
+    ocr_reader = get_reader()
+    with ocr_lock:
+        if ocr_mode == 'title' and len(regions) > 1:
+            with timed('readtext_batched'):
+                results = ocr_reader.readtext_batched(
+                    [region for _, region in regions],
+                    n_width=TITLE_STRIP_WIDTH, n_height=TITLE_STRIP_HEIGHT,
+                    batch_size=len(regions), detail=0,
+                )
+        else:
+            results = []
+            for _, region in regions:
+                with timed('readtext'):
+                    results.append(ocr_reader.readtext(region, detail=0))
+    
+        for (position, _), result in zip(regions, results):
+            if ocr_mode == 'title':
+                card_text = ' '.join(result).strip()
+                if not card_text:
+                    # Fall back to the whole card when the title crop missed (unusual frames, sideways scans)
+                    with memory_budget.hold(decoded_size(image_paths[position]), wait=False):
+                        full_result = ocr_reader.readtext(cv2.imread(image_paths[position]), detail=0)
+                    card_text = full_result[0] if full_result else ''
+            else:
+                card_text = result[0] if result else ''
+            texts[position] = card_text
+            logging.debug(f"Extracted text from {image_paths[position]}: {card_text}")
+    return texts
+
+def ocr_worker_initializer(log_queue, threads, worker_settings, processes):
+    global memory_budget
+    # Spawned workers start from the defaults, so they take the loaded settings and an equal share of the memory cap
+    settings.update(worker_settings)
+    memory_budget = MemoryBudget(settings['max_inflight_mb'] * 1048576 // processes)
+    # Thread counts have to be fixed before torch is imported, or every worker grabs all the cores
+    for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[variable] = str(threads)
+    # Records go to the parent's listener instead; the exit hook would stop this one a second time
+    log_listener.stop()
+    atexit.unregister(log_listener.stop)
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    import cv2
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError) as e:
+        logging.debug(f"Could not limit torch threads: {e}")
+    get_reader()
+
+def ocr_worker_extract(image_paths, ocr_mode):
+    # The worker's stage timings travel back with the texts so the parent can report them
+    texts = extract_card_texts(image_paths, ocr_mode)
+    with stage_lock:
+        samples = {stage: values for (stage, _), values in stage_samples.items()}
+        stage_samples.clear()
+    return texts, samples
+
+class OcrProcessPool:
+    # Runs EasyOCR in separate processes, each with its own reader and a share of the cores.
+    # Only the OCR itself happens in the workers; Scryfall lookups and file moves stay in this process.
+    def __init__(self, processes, threads_per_process=0):
+        import multiprocessing
+        self.processes = processes
+        self.threads = threads_per_process or max(1, (os.cpu_count() or 1) // processes)
+        self.context = multiprocessing.get_context('spawn')
+        self.log_queue = self.context.Queue()
+        self.log_listener = logging.handlers.QueueListener(self.log_queue, file_handler, console_handler, respect_handler_level=True)
+        self.log_listener.start()
+        self.lock = threading.Lock()
+        self.executor = self.start_executor()
+        logging.info(f"Started OCR pool with {processes} processes and {self.threads} threads each")
+    
+    def start_executor(self):
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=self.context,
+                                   initializer=ocr_worker_initializer, initargs=(self.log_queue, self.threads, dict(settings), self.processes))
+    
+    def restart(self, broken_executor):
+        # Several OCR stage threads can see the same broken pool; only the first one replaces it
+        with self.lock:
+            if self.executor is broken_executor:
+                broken_executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self.start_executor()
+    
+    def extract_card_texts(self, image_paths):
+        # A worker that dies (killed for memory, a crash in torch) breaks the whole pool for good,
+        # so the pool is restarted and the batch tried once more before its cards fail
+        from concurrent.futures.process import BrokenProcessPool
+        executor = self.executor
+        try:
+            texts, samples = executor.submit(ocr_worker_extract, image_paths, settings['ocr_mode']).result()
+        except BrokenProcessPool as e:
+            logging.warning(f"The OCR pool broke ({e}), restarting it and retrying {len(image_paths)} image(s)")
+            self.restart(executor)
+            texts, samples = self.executor.submit(ocr_worker_extract, image_paths, settings['ocr_mode']).result()
+        for stage, values in samples.items():
+            for seconds in values:
+                record_stage(stage, seconds)
+        return texts
+    
+    def close(self):
+        self.executor.shutdown()
+        self.log_listener.stop()
+
+def resolve_card_text(image_path, card_text):
+    global scryfall_online_lookups
+    card_name = resolve_card_name_locally(card_text)
+    if card_name:
+        logging.info(f"Identified card '{card_name}' for image {image_path}")
+        return card_name
+    
+    with counter_lock:
+        scryfall_online_lookups += 1
+    response = http_request('GET', f"{settings['scryfall_api_base'].rstrip('/')}/cards/named", params={'fuzzy': card_text})
+    
+    if response.status_code == 200:
+        card_data = response.json()
+        card_name = card_data['name']
+        logging.info(f"Identified card '{card_name}' for image {image_path}")
+        return card_name
+    elif response.status_code == 404:
+        logging.warning(f"Card not found for text: {card_text} in image {image_path}")
         return None
+    response.raise_for_status()
+    logging.warning(f"Unexpected Scryfall response {response.status_code} for image {image_path}")
+    return None
 
+@timed_stage('rename')
 def rename_card_image(image_path, card_name):
+    new_file_name = card_name
     try:
         sanitized_card_name = sanitize_filename(card_name)
         
         directory = os.path.dirname(image_path)
         file_extension = os.path.splitext(image_path)[1]
         
-        new_file_name = f"{sanitized_card_name}{file_extension}"
-        new_file_path = os.path.join(directory, new_file_name)
-        
-        counter = 1
-        while os.path.exists(new_file_path):
-            new_file_name = f"{sanitized_card_name}_{counter}{file_extension}"
-            new_file_path = os.path.join(directory, new_file_name)
-            counter += 1
-        
-        os.rename(image_path, new_file_path)
-        logging.info(f"Renamed '{os.path.basename(image_path)}' to '{os.path.basename(new_file_path)}'")
-        print(f"Renamed '{os.path.basename(image_path)}' to '{os.path.basename(new_file_path)}'")
+        with file_lock:
+            new_file_path = name_registry.claim(directory, sanitized_card_name, file_extension, current_path=image_path)
+            new_file_name = os.path.basename(new_file_path)
+            if new_file_path != image_path:
+                renamed_in_place.add(normalized_path(new_file_path))
+                try:
+                    os.replace(image_path, new_file_path)
+                except OSError:
+                    renamed_in_place.discard(normalized_path(new_file_path))
+                    name_registry.abandon(new_file_path)
+                    raise
+                name_registry.release(image_path)
+                logging.info(f"Renamed '{os.path.basename(image_path)}' to '{new_file_name}'")
+                print(f"Renamed '{os.path.basename(image_path)}' to '{new_file_name}'")
         
         return new_file_path
     except Exception as e:
         logging.error(f"Error renaming image {image_path} to {new_file_name}: {e}")
         return None
 
+@timed_stage('move')
 def move_file(file_path, destination_folder):
     try:
-        if not os.path.exists(destination_folder):
-            os.makedirs(destination_folder)
-        
-        destination_path = os.path.join(destination_folder, os.path.basename(file_path))
-        
-        counter = 1
-        while os.path.exists(destination_path):
+        with file_lock:
+            if os.path.normcase(os.path.abspath(os.path.dirname(file_path))) == os.path.normcase(os.path.abspath(destination_folder)):
+                return file_path
+            if not os.path.exists(destination_folder):
+                os.makedirs(destination_folder)
+            
             base, ext = os.path.splitext(os.path.basename(file_path))
-            destination_path = os.path.join(destination_folder, f"{base}_{counter}{ext}")
-            counter += 1
-        
-        shutil.move(file_path, destination_path)
+            destination_path = name_registry.claim(destination_folder, base, ext)
+            try:
+                shutil.move(file_path, destination_path)
+            except OSError:
+                name_registry.abandon(destination_path)
+                raise
+            name_registry.release(file_path)
+            renamed_in_place.discard(normalized_path(file_path))
         logging.info(f"Moved {file_path} to {destination_path}")
+        return destination_path
     except Exception as e:
         logging.error(f"Error moving file {file_path} to {destination_folder}: {e}")
+        return None
 
-def process_magic_directory(directory):
-    global magic_processed_count, error_files_count
-    no_new_files = True
-    for root, dirs, files in os.walk(directory):
-        dirs[:] = [d for d in dirs if d not in ['Processed', 'Error']]
-        
-        if root == directory:
+def move_to_error(image_path, error_folder, reason):
+    destination_path = move_file(image_path, error_folder)
+    if destination_path and retry_queue is not None:
+        retry_queue.record_failure(destination_path, reason)
+
+def file_identified_card(image_path, card_name, processed_folder, error_folder):
+    with file_lock:
+        operation_id = None
+        if operation_journal is not None:
+            operation_id = operation_journal.append({'op': 'plan', 'source': image_path, 'card_name': card_name,
+                                                     'processed': processed_folder, 'error': error_folder})
+        new_image_path = rename_card_image(image_path, card_name)
+        if new_image_path:
+            if operation_id:
+                operation_journal.append({'op': 'renamed', 'id': operation_id, 'path': new_image_path})
+            move_file(new_image_path, processed_folder)
+        else:
+            move_to_error(image_path, error_folder, 'parse')
+        if operation_id:
+            operation_journal.append({'op': 'done', 'id': operation_id})
+        return new_image_path
+
+class PerceptualHashIndex:
+    # BK-tree over perceptual hashes: finds the first stored hash within a Hamming distance
+    # while visiting only the branches the triangle inequality allows
+    def __init__(self):
+        self.root = None
+
+    def find(self, image_hash, max_distance):
+        candidates = [self.root] if self.root else []
+        while candidates:
+            node_hash, item, children = candidates.pop()
+            distance = bin(node_hash ^ image_hash).count("1")
+            if distance <= max_distance:
+                return item
+            candidates.extend(child for edge, child in children.items() if distance - max_distance <= edge <= distance + max_distance)
+        return None
+
+    def add(self, image_hash, item):
+        node = (image_hash, item, {})
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = bin(current[0] ^ image_hash).count("1")
+            if distance not in current[2]:
+                current[2][distance] = node
+                return
+            current = current[2][distance]
+
+def perceptual_hash(image_path):
+    # Difference hash of the card outline, PERCEPTUAL_HASH_SIZE**2 bits, insensitive to noise and small crops
+    import cv2
+    with memory_budget.hold(decoded_size(image_path)):
+        image = cv2.imread(image_path)
+        if image is None:
+            return None
+        x, y, width, height = find_card_bounds(image)
+        gray = cv2.cvtColor(image[y:y + height, x:x + width], cv2.COLOR_BGR2GRAY)
+        del image
+    small = cv2.resize(gray, (PERCEPTUAL_HASH_SIZE + 1, PERCEPTUAL_HASH_SIZE), interpolation=cv2.INTER_AREA)
+    value = 0
+    for bit in (small[:, 1:] > small[:, :-1]).flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+def split_duplicate_images(directory, manifest):
+    # Returns the manifest without near-duplicates, plus {representative path: [duplicate paths]}
+    if not settings['dedup_enabled']:
+        return manifest, {}
+    image_paths = [os.path.join(root, file) for root, files in manifest.items() if root != directory for file in files]
+    if len(image_paths) < 2:
+        return manifest, {}
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, settings['workers'])) as executor:
+        hashes = list(executor.map(perceptual_hash, image_paths))
+    index = PerceptualHashIndex()
+    duplicates = {}
+    for image_path, image_hash in zip(image_paths, hashes):
+        if image_hash is None:
             continue
-        print(f"Now processing {root}")
-        logging.info(f"Now processing {root}")
-        processed_folder = os.path.join(root, 'Processed')
-        error_folder = os.path.join(root, 'Error')
-        
-        for file in files:
-            if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')):
-                no_new_files = False
+        representative = index.find(image_hash, settings['dedup_max_distance'])
+        if representative is None:
+            index.add(image_hash, image_path)
+        else:
+            duplicates.setdefault(representative, []).append(image_path)
+    
+    duplicate_paths = {path for paths in duplicates.values() for path in paths}
+    filtered = {root: [file for file in files if os.path.join(root, file) not in duplicate_paths] for root, files in manifest.items()}
+    logging.info(f"Found {len(duplicate_paths)} near-duplicate images in {directory} ({time.perf_counter() - start:.1f}s)")
+    return filtered, duplicates
+
+def apply_duplicate_results(duplicates, results, apply_result, identify_again, executor=None):
+    global duplicate_images_count
+    if not duplicates:
+        return
+    print(f"Applying results to {sum(len(paths) for paths in duplicates.values())} duplicate images")
+    retries = []
+    for representative, paths in duplicates.items():
+        result = results.get(representative)
+        for image_path in paths:
+            if result:
+                logging.info(f"{image_path} is a duplicate of {representative}")
                 try:
-                    image_path = os.path.join(root, file)
-                    logging.debug(f"Processing {image_path}")
-                    
-                    card_name = get_card_name(image_path)
-                    
-                    if card_name:
-                        new_file_path = rename_card_image(image_path, card_name)
-                        if new_file_path:
-                            move_file(new_file_path, processed_folder)
-                        else:
-                            move_file(image_path, error_folder)
-                            error_files_count += 1
-                    else:
-                        move_file(image_path, error_folder)
-                        error_files_count += 1
-                    magic_processed_count += 1
+                    apply_result(image_path, result)
+                    record_first_card()
+                    with counter_lock:
+                        duplicate_images_count += 1
                 except Exception as e:
-                    logging.error(f"Error processing file {file}: {e}")
-                    print("Error: Please check Log.txt for details")
-                    move_file(os.path.join(root, file), error_folder)
-                    error_files_count += 1
-        print("Complete!")
-    return no_new_files
-
-def read_api_key(config_file):
+                    logging.error(f"Error applying duplicate result to {image_path}: {e}")
+            else:
+                # The representative could not be identified, so every copy gets its own attempt
+                retries.append(image_path)
+    if executor is not None:
+        list(executor.map(identify_again, retries))
+    else:
+        for image_path in retries:
+            identify_again(image_path)
+
+class Pipeline:
+    # Stages connected by bounded queues, each with its own worker threads. A full queue makes the
+    # stage in front of it wait, so the slowest stage sets the pace instead of the sum of all stages.
+    # A stage function takes an item (or a list of items for batched stages) and returns what is
+    # passed on; items whose stage raises are handed to on_error and dropped.
+    def __init__(self, game, on_error):
+        self.game = game
+        self.on_error = on_error
+        self.stages = []
+        self.results = []
+        self.lock = threading.Lock()
+    
+    def add_stage(self, name, function, workers=1, batch_size=1):
+        self.stages.append({'name': name, 'function': function, 'workers': max(1, workers), 'batch_size': max(1, batch_size)})
+        return self
+    
+    def run(self, items):
+        for stage in self.stages:
+            stage['queue'] = queue.Queue(maxsize=2 * stage['workers'] * stage['batch_size'])
+            stage['running'] = stage['workers']
+        threads = [threading.Thread(target=self.work, args=(index,), daemon=True)
+                   for index, stage in enumerate(self.stages) for _ in range(stage['workers'])]
+        for thread in threads:
+            thread.start()
+        first = self.stages[0]
+        for item in items:
+            first['queue'].put(item)
+        for _ in range(first['workers']):
+            first['queue'].put(None)
+        for thread in threads:
+            thread.join()
+        return self.results
+    
+    def next_batch(self, stage):
+        # Take whatever is already waiting, up to the batch size, rather than holding items back
+        batch = []
+        item = stage['queue'].get()
+        while item is not None:
+            batch.append(item)
+            if len(batch) >= stage['batch_size']:
+                break
+            try:
+                item = stage['queue'].get_nowait()
+            except queue.Empty:
+                break
+        return batch, item is None
+    
+    def work(self, index):
+        set_current_game(self.game)
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        finished = False
+        while not finished:
+            batch, finished = self.next_batch(stage)
+            if not batch:
+                continue
+            try:
+                with timed(f"stage {stage['name']}"):
+                    outputs = stage['function'](batch) if stage['batch_size'] > 1 else [stage['function'](batch[0])]
+            except Exception as e:
+                for item in batch:
+                    self.on_error(item, e)
+                continue
+            for output in outputs:
+                if output is None:
+                    continue
+                if downstream is not None:
+                    downstream['queue'].put(output)
+                else:
+                    with self.lock:
+                        self.results.append(output)
+        with self.lock:
+            stage['running'] -= 1
+            last = stage['running'] == 0
+        if last and downstream is not None:
+            for _ in range(downstream['workers']):
+                downstream['queue'].put(None)
+
+class RootProgress:
+    # Prints "Complete!" once every card of a folder has left the pipeline
+    def __init__(self, manifest, directory):
+        self.manifest = {root: files for root, files in manifest.items() if root != directory and files}
+        self.remaining = {root: len(files) for root, files in self.manifest.items()}
+        self.lock = threading.Lock()
+    
+    def items(self, make_item):
+        for root, files in self.manifest.items():
+            print(f"Now processing {root}")
+            logging.info(f"Now processing {root}")
+            for file in files:
+                yield make_item(root, file)
+    
+    def done(self, root):
+        with self.lock:
+            self.remaining[root] -= 1
+            complete = self.remaining[root] == 0
+        if complete:
+            print("Complete!")
+            logging.info(f"Finished {root}")
+
+def read_api_key(config_file, interactive=True):
     if not os.path.exists(config_file):
         logging.error(f"Configuration file '{config_file}' not found. Exiting...")
-        input("Press Enter to exit...")
+        if interactive:
+            input("Press Enter to exit...")
         sys.exit(1)
     
     with open(config_file, 'r') as file:
@@ -199,361 +1658,1629 @@ def read_api_key(config_file):
                 return line.split('=')[1].strip()
     
     logging.error(f"API key not found in '{config_file}'. Exiting...")
-    input("Press Enter to exit...")
+    if interactive:
+        input("Press Enter to exit...")
     sys.exit(1)
 
-def encode_image(image_path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+def load_settings(config_file):
+    global rate_limiter, memory_budget
+    with open(config_file, 'r') as file:
+        for line in file:
+            if '=' not in line or line.lstrip().startswith('#'):
+                continue
+            key, value = (part.strip() for part in line.split('=', 1))
+            if key == 'api_key' or not value:
+                continue
+            default = DEFAULT_SETTINGS.get(key)
+            try:
+                if isinstance(default, bool):
+                    settings[key] = value.lower() in ['1', 'true', 'yes', 'on']
+                else:
+                    settings[key] = type(default)(value) if default is not None else value
+            except ValueError:
+                logging.warning(f"Ignoring invalid value '{value}' for setting '{key}' in '{config_file}'")
+    rate_limiter = RateLimiter(settings['requests_per_minute'], settings['tokens_per_minute'])
+    memory_budget = MemoryBudget(settings['max_inflight_mb'] * 1048576)
+    logging.info(f"Settings: workers={settings['workers']}, requests_per_minute={settings['requests_per_minute']}, tokens_per_minute={settings['tokens_per_minute']}, api_base={settings['api_base']}")
+
+def get_http_session():
+    global http_session
+    with http_lock:
+        if http_session is None:
+            http_session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max(10, settings['workers']))
+            http_session.mount('https://', adapter)
+            http_session.mount('http://', adapter)
+        return http_session
+
+def get_circuit_breaker(url):
+    host = urlsplit(url).netloc
+    with http_lock:
+        if host not in circuit_breakers:
+            circuit_breakers[host] = CircuitBreaker(host, settings['circuit_failure_threshold'], settings['circuit_cooldown'])
+        return circuit_breakers[host]
+
+def retry_delay(attempt, response):
+    if response is not None:
+        retry_after_ms = response.headers.get('retry-after-ms')
+        retry_after = response.headers.get('Retry-After')
+        try:
+            if retry_after_ms:
+                return float(retry_after_ms) / 1000
+            if retry_after:
+                return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(settings['backoff_max'], settings['backoff_base'] * 2 ** attempt))
+
+def http_request(method, url, **kwargs):
+    # Retries connection errors, 429 and 5xx with backoff. Failures that open the host's circuit do not use up attempts,
+    # but failed probes do, so a host that never recovers still ends in an error the retry queue can pick up
+    kwargs.setdefault('timeout', (settings['connect_timeout'], settings['read_timeout']))
+    session = get_http_session()
+    breaker = get_circuit_breaker(url)
+    attempt = 0
+    while True:
+        probe = breaker.wait()
+        response, error = None, None
+        try:
+            with timed(f"http {urlsplit(url).netloc}"):
+                response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        except BaseException:
+            if probe:
+                breaker.release_probe()
+            raise
+        if response is not None and response.status_code != 429 and response.status_code < 500:
+            breaker.record_success()
+            return response
+        
+        circuit_open = response is None or response.status_code >= 500
+        if circuit_open:
+            circuit_open = breaker.record_failure()
+        elif probe:
+            breaker.release_probe()
+        if not circuit_open or probe:
+            attempt += 1
+            if attempt > settings['max_retries']:
+                if response is not None:
+                    return response
+                raise error
+        delay = retry_delay(attempt, response)
+        reason = f"status code {response.status_code}" if response is not None else str(error)
+        logging.warning(f"{method} {urlsplit(url).netloc} failed ({reason}), retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+def post_chat_completion(headers, payload, image_tokens=ESTIMATED_IMAGE_TOKENS, api_base=None, rate_limited=True):
+    # Local model servers have no token budget, so their requests skip the rate limiter
+    budget_entry = None
+    if rate_limited:
+        estimated_tokens = ESTIMATED_PROMPT_TOKENS + image_tokens + payload.get('max_tokens', VISION_MAX_TOKENS)
+        budget_entry = rate_limiter.acquire(estimated_tokens)
+    # Streamed so the base64 images are never held as one string alongside the JSON body
+    response = http_request('POST', f"{(api_base or settings['api_base']).rstrip('/')}/chat/completions", headers=headers, data=RequestBody(payload))
+    if response.status_code == 200 and budget_entry is not None:
+        try:
+            rate_limiter.record_usage(budget_entry, response.json()['usage']['total_tokens'])
+        except (KeyError, TypeError, ValueError):
+            pass
+    return response
+
+def estimate_image_tokens(width, height, detail):
+    # Mirrors the vision pricing tiers: fit in 2048x2048, shortest side to 768, then 512px tiles
+    if detail == 'low':
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+# Raw bytes base64-encoded per chunk while a request body is sent; a multiple of 3 so chunks join without padding
+BODY_CHUNK_SIZE = 3 * 65536
+body_buffers = threading.local()
+
+class InlineImage:
+    # An image sent as a base64 data URL. Only the encoded image is kept (or just the path when the file is
+    # uploaded unchanged); the base64 text is produced a chunk at a time while the request body is sent.
+    def __init__(self, mime_type, data=None, path=None):
+        self.mime_type = mime_type
+        self.data = data
+        self.path = path
+        self.size = len(data) if data is not None else os.path.getsize(path)
+
+    def url_prefix(self):
+        return f"data:{self.mime_type};base64,".encode('ascii')
+
+    def encoded_size(self):
+        return 4 * math.ceil(self.size / 3)
+
+    def base64_chunks(self):
+        if self.data is not None:
+            view = memoryview(self.data).cast('B')
+            for start in range(0, len(view), BODY_CHUNK_SIZE):
+                yield binascii.b2a_base64(view[start:start + BODY_CHUNK_SIZE], newline=False)
+            return
+        if not hasattr(body_buffers, 'buffer'):
+            body_buffers.buffer = bytearray(BODY_CHUNK_SIZE)
+        view = memoryview(body_buffers.buffer)
+        with open(self.path, 'rb') as image_file:
+            while True:
+                length = 0
+                while length < BODY_CHUNK_SIZE:
+                    count = image_file.readinto(view[length:])
+                    if not count:
+                        break
+                    length += count
+                if length:
+                    yield binascii.b2a_base64(view[:length], newline=False)
+                if length < BODY_CHUNK_SIZE:
+                    return
+
+class RequestBody:
+    # A JSON body whose InlineImages are streamed rather than serialised up front. It has a length, so
+    # requests sends it with a Content-Length, and every iteration starts over, so retries resend it whole.
+    MARKER = re.compile(rb'"@inline-image-(\d+)@"')
+
+    def __init__(self, payload):
+        images = []
+
+        def inline(value):
+            if not isinstance(value, InlineImage):
+                raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+            images.append(value)
+            return f"@inline-image-{len(images) - 1}@"
+
+        pieces = self.MARKER.split(json.dumps(payload, default=inline).encode('utf-8'))
+        self.parts = [piece if position % 2 == 0 else images[int(piece)] for position, piece in enumerate(pieces)]
+
+    def __len__(self):
+        return sum(len(part) if isinstance(part, bytes) else len(part.url_prefix()) + part.encoded_size() + 2
+                   for part in self.parts)
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield b'"' + part.url_prefix()
+                yield from part.base64_chunks()
+                yield b'"'
 
-def process_pokemon_image(image_path, api_key, root):
-    base64_image = encode_image(image_path)
+@timed_stage('encode_image')
+def encode_image(image_path, wait=True):
+    # Returns an InlineImage whose memory is charged to the budget for as long as it is referenced.
+    # Callers already holding images pass wait=False so they cannot wait on memory only they can free.
+    global original_upload_bytes, sent_upload_bytes
+    original_size = os.path.getsize(image_path)
+    mime_type = mimetypes.guess_type(image_path)[0] or 'image/jpeg'
+    upload_format = settings['upload_format'].lower()
+    image_tokens = ESTIMATED_IMAGE_TOKENS
+    inline_image = None
+    
+    if upload_format != 'original':
+        import cv2
+        max_edge = settings['upload_max_edge']
+        dimensions = image_dimensions(image_path)
+        # JPEGs can be decoded straight at 1/2, 1/4 or 1/8 scale when that still covers the upload size
+        reduction, flags = 1, cv2.IMREAD_COLOR
+        if max_edge and dimensions and mime_type == 'image/jpeg':
+            for factor, reduced_flags in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                if max(dimensions) // factor >= max_edge:
+                    reduction, flags = factor, reduced_flags
+                    break
+        with memory_budget.hold(decoded_size(image_path, dimensions, reduction), wait):
+            image = cv2.imread(image_path, flags)
+            if image is None:
+                logging.warning(f"Could not decode {image_path} for resizing, uploading it unchanged")
+            else:
+                height, width = image.shape[:2]
+                if max_edge and max(height, width) > max_edge:
+                    scale = max_edge / max(height, width)
+                    width, height = max(1, int(width * scale)), max(1, int(height * scale))
+                    image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+                image_tokens = estimate_image_tokens(width, height, settings['image_detail'])
+                if upload_format == 'webp':
+                    encoded, buffer = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, settings['upload_quality']])
+                    encoded_mime = 'image/webp'
+                else:
+                    encoded, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, settings['upload_quality']])
+                    encoded_mime = 'image/jpeg'
+                del image
+                # Keep the original when re-encoding would not make it any smaller
+                if encoded and (buffer.size < original_size or mime_type not in ['image/jpeg', 'image/png', 'image/webp', 'image/gif']):
+                    inline_image = memory_budget.attach(InlineImage(encoded_mime, data=buffer), buffer.nbytes)
+                del buffer
     
-    headers = {
+    if inline_image is None:
+        # Read from disk while the body is sent instead of being held until then
+        inline_image = InlineImage(mime_type, path=image_path)
+    with counter_lock:
+        original_upload_bytes += original_size
+        sent_upload_bytes += inline_image.size
+    logging.info(f"Uploading {os.path.basename(image_path)} as {inline_image.mime_type}: {original_size} bytes on disk, {inline_image.size} bytes sent")
+    return inline_image, image_tokens
+
+POKEMON_SYSTEM_PROMPT = "You are a Pokemon trading card game expert that responds in JSON."
+LORCANA_SYSTEM_PROMPT = "You are a Lorcana trading card game expert that responds in JSON."
+TCG_SYSTEM_PROMPT = "You are a TCG expert that responds in JSON."
+VISION_USER_PROMPT = "Please identify this card. Only return the name of the card, and the series it's from."
+
+def api_headers(api_key):
+    return {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {api_key}"
     }
-    
-    payload = {
-        "model": "gpt-4o",
+
+def build_vision_payload(system_prompt, image, model=None):
+    return {
+        "model": model or settings['vision_model'],
         "messages": [
-            {"role": "system", "content": "You are a Pokemon trading card game expert that responds in JSON."},
+            {"role": "system", "content": system_prompt},
             {
                 "role": "user",
                 "content": [
                     {
                         "type": "text",
-                        "text": "Please identify this card. Only return the name of the card, and the series its from."
+                        "text": VISION_USER_PROMPT
                     },
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
+                            "url": image,
+                            "detail": settings['image_detail']
                         }
                     }
                 ]
             }
         ],
-        "max_tokens": 300
+        "max_tokens": VISION_MAX_TOKENS
     }
 
-    log_message = "Submitting picture for review..."
-    print(log_message)
-    logging.info(log_message)
+GROUP_USER_PROMPT = (
+    "The following {count} images are separate cards, each preceded by its number. "
+    "Identify every card. Respond with a JSON array containing one object per card, in the same order, "
+    "with the keys \"index\" (the card number), \"name\" and \"series\". "
+    "If you are not sure about a card, set its name to null."
+)
+
+def build_group_payload(system_prompt, images, model=None):
+    content = [{"type": "text", "text": GROUP_USER_PROMPT.format(count=len(images))}]
+    for index, image in enumerate(images, start=1):
+        content.append({"type": "text", "text": f"Card {index}:"})
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": image,
+                "detail": settings['image_detail']
+            }
+        })
+    return {
+        "model": model or settings['vision_model'],
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": content}
+        ],
+        "max_tokens": 100 + 60 * len(images)
+    }
+
+def parse_group_response(response_data, count):
+    content = response_data['choices'][0]['message']['content']
+    card_data = json.loads(content.strip().strip('`').removeprefix('json'))
+    if isinstance(card_data, dict):
+        card_data = next((value for value in card_data.values() if isinstance(value, list)), [])
+    
+    # Anything missing, duplicated or unsure is left out so the caller retries it on its own
+    results = {}
+    seen = Counter(entry.get('index') for entry in card_data if isinstance(entry, dict))
+    for entry in card_data:
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get('index')
+        name, series = entry.get('name'), entry.get('series')
+        if isinstance(index, int) and 1 <= index <= count and seen[index] == 1 and name and series:
+            results[index - 1] = (str(name), str(series))
+    return results
+
+def parse_card_response(response_data):
+    content = response_data['choices'][0]['message']['content']
+    card_data = json.loads(content.strip().strip('`').removeprefix('json'))
+    return card_data.get('name', ''), card_data.get('series', '')
+
+# Recognizers: every way of identifying a card is registered by name, and the <game>_recognizers
+# settings list the ones each game tries, in order. A card one recognizer cannot identify
+# escalates to the next.
+
+VISION_SYSTEM_PROMPTS = {'pokemon': POKEMON_SYSTEM_PROMPT, 'lorcana': LORCANA_SYSTEM_PROMPT}
+
+class Recognizer:
+    # stages() returns the pipeline stages that identify cards: each function takes a list of card
+    # dicts ({'path', 'hash', ...}) and sets 'result' to (name, series) on the ones it recognizes, or
+    # 'failure' to a retry reason. Series is '' for recognizers that only know the name. Stages only
+    # receive cards that earlier recognizers (and the cache) left unidentified.
+    cache_label = None
     
-    response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
+    def __init__(self, name):
+        self.name = name
     
-    if response.status_code == 200:
-        response_data = response.json()
-        
-        try:
-            content = response_data['choices'][0]['message']['content']
-            card_data = json.loads(content.strip('```json').strip('```'))
-            card_name = card_data.get('name', '')
-            series = card_data.get('series', '')
-
-            if card_name and series:
-                sanitized_name = sanitize_filename(f"{card_name} - {series}.jpg")
-                directory, original_file_name = os.path.split(image_path)
-                new_image_path = os.path.join(directory, sanitized_name)
-                os.rename(image_path, new_image_path)
-                rename_message = f"Renamed '{original_file_name}' to '{os.path.basename(new_image_path)}'"
-                print(rename_message)
-                logging.info(rename_message)
-                move_file(new_image_path, os.path.join(root, 'Processed'))
-            else:
-                error_message = "Failed to parse the response."
-                print(error_message)
-                logging.error(error_message)
-                move_file(image_path, os.path.join(root, 'Error'))
-        except KeyError:
-            error_message = f"Unexpected response format: {response_data}"
-            print(error_message)
-            logging.error(error_message)
-            move_file(image_path, os.path.join(root, 'Error'))
-        except json.JSONDecodeError:
-            error_message = "Failed to decode the JSON response."
-            print(error_message)
-            logging.error(error_message)
-            move_file(image_path, os.path.join(root, 'Error'))
-    else:
-        error_message = f"Request failed with status code {response.status_code}"
-        print(error_message)
-        logging.error(error_message)
-        move_file(image_path, os.path.join(root, 'Error'))
+    def available(self, game):
+        return True
+    
+    def start(self):
+        # Called before a whole folder goes through the stages, for resources only worth it then
+        pass
+    
+    def close(self):
+        pass
+    
+    def stages(self, game, api_key):
+        # [(stage name, function, workers, batch size)]
+        raise NotImplementedError
 
-def process_pokemon_directory(directory, api_key):
-    global pokemon_processed_count, error_files_count
-    no_new_files = True
-    for root, dirs, files in os.walk(directory):
-        dirs[:] = [d for d in dirs if d not in ['Processed', 'Error']]
+class CardListRecognizer(Recognizer):
+    # Title-line OCR against the user's card list; only confident matches count
+    cache_label = 'easyocr-cardlist'
+    
+    def available(self, game):
+        return game in ['pokemon', 'lorcana'] and get_card_list_index(game) is not None
+    
+    def stages(self, game, api_key):
+        def match_cards(cards):
+            identified = identify_cards_locally([card['path'] for card in cards], game)
+            for card in cards:
+                card['result'] = identified.get(card['path'])
+        return [('local', match_cards, 1, settings['ocr_batch_size'])]
+
+class ScryfallRecognizer(Recognizer):
+    # EasyOCR reads the title bar and Scryfall (or the local bulk index) resolves the name
+    cache_label = 'easyocr-scryfall'
+    
+    def __init__(self, name):
+        super().__init__(name)
+        self.ocr_pool = None
+    
+    def available(self, game):
+        return game == 'magic'
+    
+    def start(self):
+        if settings['ocr_processes'] > 0:
+            self.ocr_pool = OcrProcessPool(settings['ocr_processes'], settings['ocr_threads_per_process'])
+    
+    def close(self):
+        if self.ocr_pool is not None:
+            self.ocr_pool.close()
+            self.ocr_pool = None
+    
+    def stages(self, game, api_key):
+        ocr_mode = settings['ocr_mode']
+        ocr_pool = self.ocr_pool
         
-        if root == directory:
-            continue
-        print(f"Now processing {root}")
-        logging.info(f"Now processing {root}")
+        # The pool workers decode for themselves
+        def read_cards(cards):
+            if ocr_pool is None:
+                # Only the first card may wait for memory, the rest are charged to the frames already held
+                for position, card in enumerate(cards):
+                    card['region'] = load_ocr_region(card['path'], ocr_mode, wait=position == 0)
+        
+        def ocr_cards(cards):
+            paths = [card['path'] for card in cards]
+            failure = 'unreadable'
+            try:
+                if ocr_pool is not None:
+                    texts = ocr_pool.extract_card_texts(paths)
+                else:
+                    texts = recognize_regions(paths, [card.pop('region', None) for card in cards], ocr_mode)
+            except Exception as e:
+                # The OCR engine failed (a crashed pool worker, a model error), not the images, so they are retried
+                logging.error(f"Error running OCR on {len(cards)} image(s): {e}")
+                texts, failure = [None] * len(cards), 'ocr'
+            for card, text in zip(cards, texts):
+                # No text at all means the image could not be read; an empty string means nothing was recognised
+                card['text'] = text
+                if text is None:
+                    card['failure'] = failure
         
-        for file in files:
-            if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')):
-                no_new_files = False
+        def resolve_cards(cards):
+            for card in cards:
+                if card.get('text') is None:
+                    continue
                 try:
-                    image_path = os.path.join(root, file)
-                    logging.debug(f"Processing {image_path}")
-                    
-                    process_pokemon_image(image_path, api_key, root)
-                    pokemon_processed_count += 1
+                    card_name = resolve_card_text(card['path'], card.pop('text'))
+                    card['result'] = (card_name, '') if card_name else None
                 except Exception as e:
-                    logging.error(f"Error processing file {file}: {e}")
-                    print("Error: Please check Log.txt for details")
-                    move_file(image_path, os.path.join(root, 'Error'))
-                    error_files_count += 1
-        print("Complete!")
-    return no_new_files
-
-# New functions for Lorcana processing
+                    logging.error(f"Error processing image {card['path']}: {e}")
+                    card['failure'] = classify_exception(e)
+        
+        return [
+            ('read', read_cards, 1 if ocr_pool is not None else 2, 1),
+            ('ocr', ocr_cards, ocr_pool.processes if ocr_pool is not None else 1, settings['ocr_batch_size']),
+            ('resolve', resolve_cards, settings['workers'], 1),
+        ]
 
-def process_lorcana_image(image_path, api_key, root):
-    base64_image = encode_image(image_path)
+class VisionRecognizer(Recognizer):
+    # A vision model behind the chat completions API: GPT-4o, or a local server speaking the same API.
+    # The api_base, model and api_key settings name where this recognizer reads its configuration.
+    def __init__(self, name, api_base_setting, model_setting, api_key_setting=None, rate_limited=True):
+        super().__init__(name)
+        self.api_base_setting = api_base_setting
+        self.model_setting = model_setting
+        self.api_key_setting = api_key_setting
+        self.rate_limited = rate_limited
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
+    @property
+    def cache_label(self):
+        return settings[self.model_setting]
     
-    payload = {
-        "model": "gpt-4o",
-        "messages": [
-            {"role": "system", "content": "You are a Lorcana trading card game expert that responds in JSON."},
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "Please identify this card. Only return the name of the card, and the series its from."
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": 300
-    }
-
-    log_message = "Submitting picture for review..."
-    print(log_message)
-    logging.info(log_message)
+    def available(self, game):
+        return bool(settings[self.api_base_setting] and settings[self.model_setting])
     
-    response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
+    def headers(self, api_key):
+        if self.api_key_setting:
+            api_key = settings[self.api_key_setting]
+        return api_headers(api_key) if api_key else {"Content-Type": "application/json"}
     
-    if response.status_code == 200:
-        response_data = response.json()
+    def post(self, api_key, payload, image_tokens):
+        return post_chat_completion(self.headers(api_key), payload, image_tokens,
+                                    api_base=settings[self.api_base_setting], rate_limited=self.rate_limited)
+    
+    def stages(self, game, api_key):
+        system_prompt = VISION_SYSTEM_PROMPTS.get(game, TCG_SYSTEM_PROMPT)
+        if settings['cards_per_request'] > 1:
+            return [('identify', lambda cards: self.identify_group(cards, system_prompt, api_key),
+                     settings['workers'], settings['cards_per_request'])]
+        # Encoding is CPU-bound and requests mostly wait on the network, so they get separate thread counts
+        return [
+            ('encode', lambda cards: [self.encode(card, system_prompt) for card in cards], min(4, os.cpu_count() or 1), 1),
+            ('identify', lambda cards: [self.request(card, api_key) for card in cards], settings['workers'], 1),
+        ]
+    
+    def encode(self, card, system_prompt):
+        image, card['tokens'] = encode_image(card['path'])
+        card['payload'] = build_vision_payload(system_prompt, image, settings[self.model_setting])
+        return card
+    
+    def request(self, card, api_key):
+        card['failure'] = 'not_found'
+        log_message = "Submitting picture for review..."
+        print(log_message)
+        logging.info(log_message)
         
+        response = self.post(api_key, card.pop('payload'), card['tokens'])
+        if response.status_code != 200:
+            error_message = f"Request failed with status code {response.status_code}"
+            print(error_message)
+            logging.error(error_message)
+            card['failure'] = classify_status(response.status_code)
+            return card
         try:
-            content = response_data['choices'][0]['message']['content']
-            card_data = json.loads(content.strip('```json').strip('```'))
-            card_name = card_data.get('name', '')
-            series = card_data.get('series', '')
-
-            if card_name and series:
-                sanitized_name = sanitize_filename(f"{card_name} - {series}.jpg")
-                directory, original_file_name = os.path.split(image_path)
-                new_image_path = os.path.join(directory, sanitized_name)
-                os.rename(image_path, new_image_path)
-                rename_message = f"Renamed '{original_file_name}' to '{os.path.basename(new_image_path)}'"
-                print(rename_message)
-                logging.info(rename_message)
-                move_file(new_image_path, os.path.join(root, 'Processed'))
-            else:
-                error_message = "Failed to parse the response."
-                print(error_message)
-                logging.error(error_message)
-                move_file(image_path, os.path.join(root, 'Error'))
+            response_data = response.json()
+            card_name, series = parse_card_response(response_data)
         except KeyError:
             error_message = f"Unexpected response format: {response_data}"
             print(error_message)
             logging.error(error_message)
-            move_file(image_path, os.path.join(root, 'Error'))
+            card['failure'] = 'parse'
+            return card
         except json.JSONDecodeError:
             error_message = "Failed to decode the JSON response."
             print(error_message)
             logging.error(error_message)
-            move_file(image_path, os.path.join(root, 'Error'))
-    else:
-        error_message = f"Request failed with status code {response.status_code}"
-        print(error_message)
-        logging.error(error_message)
-        move_file(image_path, os.path.join(root, 'Error'))
-
-def process_lorcana_directory(directory, api_key):
-    global lorcana_processed_count, error_files_count
-    no_new_files = True
-    for root, dirs, files in os.walk(directory):
-        dirs[:] = [d for d in dirs if d not in ['Processed', 'Error']]
+            card['failure'] = 'parse'
+            return card
+        if card_name and series:
+            card['result'] = (card_name, series)
+        else:
+            error_message = "Failed to parse the response."
+            print(error_message)
+            logging.error(error_message)
+        return card
+    
+    def identify_group(self, cards, system_prompt, api_key):
+        # Several cards in one request; cards the group request leaves ambiguous get a request of their own
+        identified = {}
+        if len(cards) > 1:
+            try:
+                identified = self.request_group(system_prompt, [card['path'] for card in cards], api_key)
+            except Exception as e:
+                logging.error(f"Error identifying a group of {len(cards)} cards, retrying them individually: {e}")
+        for card in cards:
+            card['result'] = identified.get(card['path'])
+            if not card['result']:
+                self.request(self.encode(card, system_prompt), api_key)
+    
+    def request_group(self, system_prompt, image_paths, api_key):
+        images = []
+        image_tokens = 0
+        for image_path in image_paths:
+            image, tokens = encode_image(image_path, wait=not images)
+            images.append(image)
+            image_tokens += tokens
+        payload = build_group_payload(system_prompt, images, settings[self.model_setting])
+        del images
         
-        if root == directory:
-            continue
-        print(f"Now processing {root}")
-        logging.info(f"Now processing {root}")
+        log_message = f"Submitting {len(image_paths)} pictures for review..."
+        print(log_message)
+        logging.info(log_message)
+        response = self.post(api_key, payload, image_tokens)
+        if response.status_code != 200:
+            logging.error(f"Group request failed with status code {response.status_code}, retrying cards individually")
+            return {}
+        try:
+            results = parse_group_response(response.json(), len(image_paths))
+        except (KeyError, IndexError, TypeError, AttributeError, json.JSONDecodeError) as e:
+            logging.error(f"Could not parse group response, retrying cards individually: {e}")
+            return {}
+        if len(results) < len(image_paths):
+            logging.info(f"{len(image_paths) - len(results)} of {len(image_paths)} cards in the group were ambiguous, retrying individually")
+        return {image_paths[position]: result for position, result in results.items()}
+
+recognizers = {}
+
+def register_recognizer(recognizer):
+    recognizers[recognizer.name] = recognizer
+    return recognizer
+
+register_recognizer(CardListRecognizer('card_list'))
+register_recognizer(ScryfallRecognizer('easyocr_scryfall'))
+register_recognizer(VisionRecognizer('gpt4o', 'api_base', 'vision_model'))
+register_recognizer(VisionRecognizer('local_vision', 'local_vision_api_base', 'local_vision_model',
+                                     api_key_setting='local_vision_api_key', rate_limited=False))
+
+recognition_outcomes = Counter()
+
+def configured_recognizers(game):
+    return [name.strip() for name in settings[f"{game}_recognizers"].split(',') if name.strip()]
+
+def recognizer_chain(game):
+    # The configured recognizers that can run for this game right now (a card list may not be set up)
+    return [recognizers[name] for name in configured_recognizers(game) if name in recognizers and recognizers[name].available(game)]
+
+def check_recognizers(games):
+    for game in games:
+        unknown = [name for name in configured_recognizers(game) if name not in recognizers]
+        if unknown:
+            logging.warning(f"Unknown recognizers in {game}_recognizers: {', '.join(unknown)} (known: {', '.join(recognizers)})")
+        if not recognizer_chain(game):
+            logging.error(f"No usable recognizer configured for {game} cards; they will all go to the Error folders")
+
+def record_recognition(game, recognizer, card):
+    hit = bool(card.get('result'))
+    with counter_lock:
+        recognition_outcomes[(game, recognizer.name, 'hit' if hit else 'miss')] += 1
+    record_stage(f"recognizer {recognizer.name}", card.pop('recognizer_seconds', 0.0))
+    if hit:
+        card.pop('failure', None)
+        remember_identification(card.get('hash'), *card['result'], recognizer.cache_label or recognizer.name, card['path'])
+
+def recognition_stages(game, api_key, chain, escalate_last=False):
+    # Wraps every recognizer stage so it only sees cards still unidentified and charges each card its
+    # share of the call; after a recognizer's last stage, its hits and misses are counted. A recognizer
+    # that raises counts as having identified nothing, so its cards escalate to the next one; only the
+    # last recognizer's errors reach the pipeline, unless escalate_last says another one follows (batch mode).
+    stages = []
+    for index, recognizer in enumerate(chain):
+        recognizer_stages = recognizer.stages(game, api_key)
+        escalates = escalate_last or index < len(chain) - 1
+        for position, (name, function, workers, batch_size) in enumerate(recognizer_stages):
+            last = position == len(recognizer_stages) - 1
+            
+            def run(cards, recognizer=recognizer, function=function, last=last, escalates=escalates):
+                pending = [card for card in cards if not card.get('result') and card.get('failed_recognizer') != recognizer.name]
+                if pending:
+                    started = time.perf_counter()
+                    failed = False
+                    try:
+                        function(pending)
+                    except Exception as e:
+                        if not escalates:
+                            raise
+                        logging.error(f"Recognizer {recognizer.name} failed on {len(pending)} card(s), passing them on: {e}")
+                        failed = True
+                    share = (time.perf_counter() - started) / len(pending)
+                    for card in pending:
+                        card['recognizer_seconds'] = card.get('recognizer_seconds', 0.0) + share
+                        if failed:
+                            # The rest of this recognizer's stages skip the card
+                            card['failed_recognizer'] = recognizer.name
+                    if last or failed:
+                        for card in pending:
+                            record_recognition(game, recognizer, card)
+                return cards
+            stages.append((name, run, workers, batch_size))
+    return stages
+
+def look_up_card(card, game):
+    # Magic cards are filed under their name alone, so only they accept cache entries without a series,
+    # apart from matches from a card list that has no series either
+    card['hash'], cached = cached_identification(card['path'], require_series=game != 'magic',
+                                                 series_optional_backends=(CardListRecognizer.cache_label,))
+    if cached:
+        card['result'] = cached
+    return card
+
+def recognize_cards(cards, game, api_key, chain=None, escalate_last=False):
+    # Runs cards through a game's recognizers one stage at a time, for callers outside a folder pipeline
+    for card in cards:
+        look_up_card(card, game)
+    for name, function, workers, batch_size in recognition_stages(game, api_key, recognizer_chain(game) if chain is None else chain, escalate_last):
+        for start in range(0, len(cards), max(1, batch_size)):
+            function(cards[start:start + max(1, batch_size)])
+    return cards
+
+def file_recognized_card(card, counter_name=None):
+    # Cards being retried sit in an Error folder, so their Processed folder is one level up
+    root = os.path.dirname(card['path'])
+    error_folder = os.path.join(root, 'Error')
+    if os.path.basename(root) == 'Error':
+        root, error_folder = os.path.dirname(root), root
+    identified = False
+    try:
+        if card.get('result'):
+            identified = bool(file_identified_card(card['path'], card_file_name(*card['result']), os.path.join(root, 'Processed'), error_folder))
+        else:
+            move_to_error(card['path'], error_folder, card.get('failure') or 'not_found')
+    except Exception as e:
+        logging.error(f"Error processing file {os.path.basename(card['path'])}: {e}")
+        print("Error: Please check Log.txt for details")
+        move_to_error(card['path'], error_folder, classify_exception(e))
+    if counter_name:
+        if not identified:
+            increment_count('error_files_count')
+        increment_count(counter_name)
+        record_first_card()
+    return identified
+
+def process_card_files(image_paths, game, api_key):
+    # Identifies and files a handful of cards outside a folder pipeline (watch mode, duplicates)
+    set_current_game(game)
+    started = time.perf_counter()
+    cards = [{'path': image_path} for image_path in image_paths]
+    for image_path in image_paths:
+        logging.debug(f"Processing {image_path}")
+    try:
+        recognize_cards(cards, game, api_key)
+    except Exception as e:
+        logging.error(f"Error identifying {len(cards)} {game} card(s): {e}")
+        print("Error: Please check Log.txt for details")
+        for card in cards:
+            card['failure'] = card.get('failure') or classify_exception(e)
+    results = {}
+    for card in cards:
+        file_recognized_card(card, f"{game}_processed_count")
+        # Every card in a batch waits for the whole batch, so each one is charged the full time
+        record_stage('card', time.perf_counter() - started)
+        results[card['path']] = card.get('result')
+    return results
+
+def apply_card_result(game):
+    def apply_result(image_path, result):
+        root = os.path.dirname(image_path)
+        file_identified_card(image_path, card_file_name(*result), os.path.join(root, 'Processed'), os.path.join(root, 'Error'))
+        increment_count(f"{game}_processed_count")
+    return apply_result
+
+def process_game_directory(directory, game, api_key, manifest=None):
+    if manifest is None:
+        manifest = scan_game_directory(directory)
+    manifest, duplicates = split_duplicate_images(directory, manifest)
+    chain = recognizer_chain(game)
+    progress = RootProgress(manifest, directory)
+    
+    def look_up(card):
+        card['started'] = time.perf_counter()
+        return look_up_card(card, game)
+    
+    def file_card(card):
+        file_recognized_card(card, f"{game}_processed_count")
+        record_stage('card', time.perf_counter() - card['started'])
+        progress.done(card['root'])
+        return card
+    
+    def on_error(card, error):
+        logging.error(f"Error processing file {os.path.basename(card['path'])}: {error}")
+        print("Error: Please check Log.txt for details")
+        card['result'], card['failure'] = None, classify_exception(error)
+        file_recognized_card(card, f"{game}_processed_count")
+        progress.done(card['root'])
+    
+    def make_card(root, file):
+        return {'root': root, 'path': os.path.join(root, file)}
+    
+    for recognizer in chain:
+        recognizer.start()
+    try:
+        pipeline = Pipeline(game, on_error).add_stage('cache', look_up, workers=2)
+        for name, function, workers, batch_size in recognition_stages(game, api_key, chain):
+            pipeline.add_stage(name, function if batch_size > 1 else (lambda card, function=function: function([card])[0]),
+                               workers=workers, batch_size=batch_size)
+        pipeline.add_stage('file', file_card)
+        cards = pipeline.run(progress.items(make_card))
+        results = {card['path']: card.get('result') for card in cards}
         
-        for file in files:
-            if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')):
-                no_new_files = False
-                try:
-                    image_path = os.path.join(root, file)
-                    logging.debug(f"Processing {image_path}")
-                    
-                    process_lorcana_image(image_path, api_key, root)
-                    lorcana_processed_count += 1
-                except Exception as e:
-                    logging.error(f"Error processing file {file}: {e}")
-                    print("Error: Please check Log.txt for details")
-                    move_file(image_path, os.path.join(root, 'Error'))
-                    error_files_count += 1
-        print("Complete!")
-    return no_new_files
+        with ThreadPoolExecutor(max_workers=max(1, settings['workers'])) as executor:
+            def identify_again(image_path):
+                return process_card_files([image_path], game, api_key)[image_path]
+            
+            apply_duplicate_results(duplicates, results, apply_card_result(game), identify_again, executor)
+    finally:
+        for recognizer in chain:
+            recognizer.close()
+    return not progress.remaining
 
 def reprocess_error_files(directory, api_key):
+    # Only files whose retry is due are sent again; everything else waits in the retry queue
     global fixed_files_count
-    for root, dirs, files in os.walk(directory):
-        for d in dirs:
-            if d == 'Error':
-                error_folder = os.path.join(root, d)
-                processed_folder = os.path.join(root, 'Processed')
-                for file in os.listdir(error_folder):
-                    if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')):
-                        image_path = os.path.join(error_folder, file)
-                        logging.info(f"Reprocessing {image_path}")
-                        print(f"Reprocessing {image_path}")
-                        
-                        base64_image = encode_image(image_path)
-                        
-                        headers = {
-                            "Content-Type": "application/json",
-                            "Authorization": f"Bearer {api_key}"
-                        }
-                        
-                        payload = {
-                            "model": "gpt-4o",
-                            "messages": [
-                                {"role": "system", "content": "You are a TCG expert that responds in JSON."},
-                                {
-                                    "role": "user",
-                                    "content": [
-                                        {
-                                            "type": "text",
-                                            "text": "Please identify this card. Only return the name of the card, and the series it's from."
-                                        },
-                                        {
-                                            "type": "image_url",
-                                            "image_url": {
-                                                "url": f"data:image/jpeg;base64,{base64_image}"
-                                            }
-                                        }
-                                    ]
-                                }
-                            ],
-                            "max_tokens": 300
-                        }
+    set_current_game('retry')
+    due = retry_queue.due(directory) if retry_queue is not None else []
+    batch_size = max(1, settings['cards_per_request'])
+    for start in range(0, len(due), batch_size):
+        cards = []
+        for image_path in due[start:start + batch_size]:
+            logging.info(f"Reprocessing {image_path}")
+            print(f"Reprocessing {image_path}")
+            cards.append({'path': image_path})
+        try:
+            recognize_cards(cards, 'retry', api_key)
+        except Exception as e:
+            logging.error(f"Error reprocessing {len(cards)} file(s) in {directory}: {e}")
+            print("Error: Please check Log.txt for details")
+            for card in cards:
+                card['failure'] = card.get('failure') or classify_exception(e)
+        for card in cards:
+            if file_recognized_card(card):
+                retry_queue.forget(card['path'])
+                fixed_files_count += 1
 
-                        try:
-                            response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
-                            
-                            if response.status_code == 200:
-                                response_data = response.json()
-                                
-                                try:
-                                    content = response_data['choices'][0]['message']['content']
-                                    card_data = json.loads(content.strip('```json').strip('```'))
-                                    card_name = card_data.get('name', '')
-                                    series = card_data.get('series', '')
-
-                                    if card_name and series:
-                                        sanitized_name = sanitize_filename(f"{card_name} - {series}.jpg")
-                                        new_image_path = os.path.join(os.path.dirname(image_path), sanitized_name)
-                                        os.rename(image_path, new_image_path)
-                                        rename_message = f"Renamed '{os.path.basename(image_path)}' to '{os.path.basename(new_image_path)}'"
-                                        print(rename_message)
-                                        logging.info(rename_message)
-                                        move_file(new_image_path, processed_folder)
-                                        fixed_files_count += 1
-                                    else:
-                                        move_file(image_path, error_folder)
-                                        logging.error(f"Failed to parse the response for {image_path}")
-                                except (KeyError, json.JSONDecodeError) as e:
-                                    logging.error(f"Error decoding response for {image_path}: {e}")
-                                    move_file(image_path, error_folder)
-                            else:
-                                logging.error(f"Request failed for {image_path} with status code {response.status_code}")
-                                move_file(image_path, error_folder)
-                        except Exception as e:
-                            logging.error(f"Error reprocessing file {file}: {e}")
-                            print(f"Error: Please check Log.txt for details")
-                            move_file(image_path, error_folder)
+def print_retry_queue():
+    if retry_queue is None:
+        return
+    reasons = retry_queue.summary()
+    if reasons:
+        message = "Files waiting for a retry: " + ", ".join(f"{count} {reason}" for reason, count in sorted(reasons.items()))
+        print(message)
+        logging.info(message)
 
-def main():
-    logging.info("Script is starting up...")
+# Batch mode: Pokemon and Lorcana cards are submitted through the Batch API and collected later.
+# Progress is kept in the batch state file so a run can stop after submitting and resume collecting.
+
+BATCH_MAX_REQUESTS = 50000
+BATCH_TERMINAL_STATUSES = ['completed', 'failed', 'expired', 'cancelled']
+
+def load_batch_state():
+    state_file = settings['batch_state_file']
+    if not os.path.exists(state_file):
+        return None
+    with open(state_file, 'r') as file:
+        return json.load(file)
+
+def save_batch_state(state):
+    state_file = settings['batch_state_file']
+    temporary_file = f"{state_file}.tmp"
+    with open(temporary_file, 'w') as file:
+        json.dump(state, file, indent=1)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_file, state_file)
+
+BATCH_RECOGNIZER = 'gpt4o'
+
+def batch_chain(game):
+    # Recognizers configured ahead of gpt4o still run on the spot; gpt4o itself becomes the batch job.
+    # Returns (recognizers to run first, the batched recognizer), or (chain, None) without gpt4o.
+    chain = recognizer_chain(game)
+    names = [recognizer.name for recognizer in chain]
+    if BATCH_RECOGNIZER not in names:
+        return chain, None
+    position = names.index(BATCH_RECOGNIZER)
+    return chain[:position], chain[position]
+
+def build_batch_requests(vision_folders, api_key):
+    state = {'created': time.time(), 'batches': [], 'cards': {}}
+    max_bytes = settings['batch_max_file_mb'] * 1048576
+    batch_file = None
     
-    pokemon_folder = "Pokemon"
-    magic_folder = "Magic"
-    lorcana_folder = "Lorcana"
+    for directory, game, manifest in vision_folders:
+        if not os.path.exists(directory):
+            continue
+        if manifest is None:
+            manifest = scan_game_directory(directory)
+        set_current_game(game)
+        local_chain, recognizer = batch_chain(game)
+        system_prompt = VISION_SYSTEM_PROMPTS.get(game, TCG_SYSTEM_PROMPT)
+        cards = [{'root': root, 'path': os.path.join(root, file)} for root, files in manifest.items() if root != directory for file in files]
+        # In slices, so the earlier recognizers never hold a whole folder of images at once
+        chunk_size = max(1, settings['ocr_batch_size'])
+        for start in range(0, len(cards), chunk_size):
+            chunk = cards[start:start + chunk_size]
+            failed = False
+            try:
+                recognize_cards(chunk, game, api_key, local_chain, escalate_last=recognizer is not None)
+            except Exception as e:
+                logging.error(f"Error identifying {len(chunk)} {game} card(s) before batch submission: {e}")
+                print("Error: Please check Log.txt for details")
+                failed = True
+                for card in chunk:
+                    card['failure'] = card.get('failure') or classify_exception(e)
+            for card in chunk:
+                if failed or card.get('result'):
+                    file_recognized_card(card, f"{game}_processed_count")
+                    continue
+                try:
+                    image, _ = encode_image(card['path'])
+                    image_hash = card.get('hash') or hash_image(card['path'])
+                except Exception as e:
+                    logging.error(f"Error preparing file {os.path.basename(card['path'])} for batch submission: {e}")
+                    card['failure'] = classify_exception(e)
+                    file_recognized_card(card, f"{game}_processed_count")
+                    continue
+                
+                custom_id = f"card-{len(state['cards'])}"
+                line = RequestBody({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": build_vision_payload(system_prompt, image, settings[recognizer.model_setting]),
+                })
+                line_bytes = len(line) + 1
+                batch = state['batches'][-1] if state['batches'] else None
+                if batch is None or batch['requests'] >= BATCH_MAX_REQUESTS or batch['bytes'] + line_bytes > max_bytes:
+                    if batch_file:
+                        batch_file.close()
+                    input_file = f"batch_input_{len(state['batches'])}.jsonl"
+                    batch = {'input_file': shard.file_name(input_file) if shard is not None else input_file, 'requests': 0, 'bytes': 0,
+                             'file_id': None, 'batch_id': None, 'status': None, 'output_file_id': None,
+                             'error_file_id': None, 'collected': False}
+                    state['batches'].append(batch)
+                    batch_file = open(batch['input_file'], 'wb')
+                for chunk_bytes in line:
+                    batch_file.write(chunk_bytes)
+                batch_file.write(b'\n')
+                del line, image
+                batch['requests'] += 1
+                batch['bytes'] += line_bytes
+                state['cards'][custom_id] = {'path': card['path'], 'root': card['root'], 'game': game, 'image_hash': image_hash,
+                                             'recognizer': recognizer.name}
+    if batch_file:
+        batch_file.close()
+    return state
+
+def submit_batches(state, api_key):
+    api_base = settings['api_base'].rstrip('/')
+    headers = {"Authorization": f"Bearer {api_key}"}
+    for batch in state['batches']:
+        if batch['file_id'] is None:
+            print(f"Uploading {batch['input_file']} ({batch['requests']} cards)...")
+            with open(batch['input_file'], 'rb') as file:
+                data = file.read()
+            response = http_request('POST', f"{api_base}/files", headers=headers,
+                                    data={'purpose': 'batch'}, files={'file': (batch['input_file'], data, 'application/jsonl')})
+            if response.status_code != 200:
+                raise RuntimeError(f"Batch file upload failed with status code {response.status_code}: {response.text}")
+            batch['file_id'] = response.json()['id']
+            save_batch_state(state)
+        if batch['batch_id'] is None:
+            response = http_request('POST', f"{api_base}/batches", headers=api_headers(api_key), json={
+                "input_file_id": batch['file_id'],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h",
+            })
+            if response.status_code != 200:
+                raise RuntimeError(f"Batch creation failed with status code {response.status_code}: {response.text}")
+            batch['batch_id'] = response.json()['id']
+            batch['status'] = response.json().get('status')
+            save_batch_state(state)
+            message = f"Submitted batch {batch['batch_id']} with {batch['requests']} cards"
+            print(message)
+            logging.info(message)
+
+def locate_batch_card(card):
+    # Fall back to a content match in case the file was renamed since it was submitted
+    if os.path.exists(card['path']):
+        return card['path']
+    if not card['image_hash'] or not os.path.isdir(card['root']):
+        return None
+    for entry in os.scandir(card['root']):
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            if hash_image(entry.path) == card['image_hash']:
+                return entry.path
+    return None
+
+def apply_batch_result(card, result):
+    # Filed and counted exactly like a card the recognizer identified online
+    image_path = locate_batch_card(card)
+    if image_path is None:
+        logging.warning(f"Skipping batch result for {card['path']}: file no longer exists")
+        return
+    set_current_game(card['game'])
+    recognizer = recognizers[card.get('recognizer', BATCH_RECOGNIZER)]
+    recognized = {'path': image_path, 'hash': card['image_hash'], 'failure': 'parse'}
+    response = result.get('response') or {}
+    try:
+        if response.get('status_code') != 200:
+            recognized['failure'] = classify_status(response.get('status_code'))
+            raise ValueError(f"request failed with status code {response.get('status_code')}: {result.get('error')}")
+        card_name, series = parse_card_response(response['body'])
+        if card_name and series:
+            recognized['result'] = (card_name, series)
+        else:
+            recognized['failure'] = 'not_found'
+            logging.error(f"Batch result for {image_path}: failed to parse the response")
+    except (KeyError, ValueError, AttributeError, TypeError) as e:
+        logging.error(f"Batch result for {image_path}: {e}")
+    record_recognition(card['game'], recognizer, recognized)
+    file_recognized_card(recognized, f"{card['game']}_processed_count")
+
+def collect_batches(state, api_key):
+    api_base = settings['api_base'].rstrip('/')
+    headers = api_headers(api_key)
+    while True:
+        pending = [batch for batch in state['batches'] if not batch['collected']]
+        if not pending:
+            return
+        for batch in pending:
+            response = http_request('GET', f"{api_base}/batches/{batch['batch_id']}", headers=headers)
+            if response.status_code != 200:
+                logging.error(f"Could not check batch {batch['batch_id']}: status code {response.status_code}")
+                continue
+            batch_data = response.json()
+            batch['status'] = batch_data.get('status')
+            if batch['status'] not in BATCH_TERMINAL_STATUSES:
+                counts = batch_data.get('request_counts') or {}
+                print(f"Batch {batch['batch_id']} is {batch['status']} ({counts.get('completed', 0)}/{counts.get('total', batch['requests'])} done)")
+                continue
+            
+            results = {}
+            for file_key in ['output_file_id', 'error_file_id']:
+                batch[file_key] = batch_data.get(file_key)
+                if not batch[file_key]:
+                    continue
+                response = http_request('GET', f"{api_base}/files/{batch[file_key]}/content", headers=headers)
+                if response.status_code != 200:
+                    raise RuntimeError(f"Could not download batch results {batch[file_key]}: status code {response.status_code}")
+                for line in response.text.splitlines():
+                    if line.strip():
+                        result = json.loads(line)
+                        results[result.get('custom_id')] = result
+            
+            for custom_id, result in results.items():
+                card = state['cards'].get(custom_id)
+                if card:
+                    apply_batch_result(card, result)
+            if batch['status'] != 'completed':
+                message = f"Batch {batch['batch_id']} ended as {batch['status']}; {batch['requests'] - len(results)} unanswered cards stay in place for the next run"
+                print(message)
+                logging.warning(message)
+            batch['collected'] = True
+            save_batch_state(state)
+        if any(not batch['collected'] for batch in state['batches']):
+            time.sleep(settings['batch_poll_interval'])
+
+def run_batch_mode(api_key, vision_folders):
+    state = load_batch_state()
+    if state is None:
+        state = build_batch_requests(vision_folders, api_key)
+        if not state['cards']:
+            for batch in state['batches']:
+                os.remove(batch['input_file'])
+            return True
+        save_batch_state(state)
+    else:
+        print(f"Resuming batch run started {time.ctime(state['created'])}")
+        logging.info(f"Resuming batch run from '{settings['batch_state_file']}'")
     
-    config_file = "tcg.cfg"
-    api_key = read_api_key(config_file)
+    submit_batches(state, api_key)
+    if not settings['batch_wait']:
+        print("Batch submitted. Run the script again to collect the results.")
+        return False
     
-    no_new_files = True
+    collect_batches(state, api_key)
+    for batch in state['batches']:
+        if os.path.exists(batch['input_file']):
+            os.remove(batch['input_file'])
+    os.remove(settings['batch_state_file'])
+    return False
+
+# Watch mode: a long-running, non-interactive loop that processes images as they are dropped in.
+# Linux uses inotify (through ctypes, no extra dependency); other platforms poll folder mtimes.
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_EVENT_HEADER = struct.Struct('iIII')
+
+def watchable_folders(directory):
+    folders = []
+    pending = [directory]
+    while pending:
+        folder = pending.pop()
+        folders.append(folder)
+        try:
+            with os.scandir(folder) as entries:
+                pending.extend(entry.path for entry in entries if entry.is_dir() and entry.name not in ['Processed', 'Error'])
+        except OSError:
+            continue
+    return folders
+
+def folder_images(folder):
+    try:
+        with os.scandir(folder) as entries:
+            return [entry.path for entry in entries if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)]
+    except OSError:
+        return []
+
+class InotifyWatcher:
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+
+    def __init__(self, directories):
+        import ctypes
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init failed")
+        self.directories = directories
+        self.watches = {}
+
+    def add_folder(self, folder):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), self.MASK)
+        if wd >= 0:
+            self.watches[wd] = folder
+        return folder_images(folder)
+
+    def start(self):
+        found = []
+        for directory in self.directories:
+            for folder in watchable_folders(directory):
+                found.extend(self.add_folder(folder))
+        return found
+
+    def poll(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        data = os.read(self.fd, 65536)
+        found = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + INOTIFY_EVENT_HEADER.size:offset + INOTIFY_EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += INOTIFY_EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                logging.warning("Watch event queue overflowed, rescanning watched folders")
+                found.extend(path for folder in list(self.watches.values()) for path in folder_images(folder))
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            folder = self.watches.get(wd)
+            if folder is None or not name:
+                continue
+            path = os.path.join(folder, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and name not in ['Processed', 'Error']:
+                    # Files can land in a new folder before its watch is in place, so pick those up too
+                    for subfolder in watchable_folders(path):
+                        found.extend(self.add_folder(subfolder))
+            elif name.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(path)
+        return found
 
-    if os.path.exists(pokemon_folder):
-        logging.info("Pokemon folder detected. Running OpenAI submission script.")
-        preprocess_file_names(pokemon_folder)
-        no_new_files = process_pokemon_directory(pokemon_folder, api_key) and no_new_files
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    # Only folders whose mtime changed are listed again, so an idle poll costs one stat per folder
+    def __init__(self, directories, interval):
+        self.directories = directories
+        self.interval = interval
+        self.folder_mtimes = {}
+
+    def _check(self, folder):
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            self.folder_mtimes.pop(folder, None)
+            return []
+        if self.folder_mtimes.get(folder) == mtime:
+            return []
+        self.folder_mtimes[folder] = mtime
+        found = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if entry.name not in ['Processed', 'Error'] and entry.path not in self.folder_mtimes:
+                            found.extend(self._check(entry.path))
+                    elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        found.append(entry.path)
+        except OSError:
+            pass
+        return found
+
+    def start(self):
+        found = []
+        for directory in self.directories:
+            found.extend(self._check(directory))
+        return found
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        found = []
+        for folder in list(self.folder_mtimes):
+            found.extend(self._check(folder))
+        return found
+
+    def close(self):
+        pass
+
+def create_folder_watcher(directories):
+    if sys.platform.startswith('linux'):
+        try:
+            watcher = InotifyWatcher(directories)
+            logging.info("Watching folders with inotify")
+            return watcher
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify unavailable ({e}), falling back to polling")
+    logging.info(f"Watching folders by polling every {settings['watch_poll_interval']}s")
+    return PollingWatcher(directories, settings['watch_poll_interval'])
+
+def run_watch_mode(api_key, game_folders):
+    # game_folders maps a top-level folder to 'magic', 'pokemon' or 'lorcana'
+    directories = [directory for directory in game_folders if os.path.exists(directory)]
+    if not directories:
+        print("No Pokemon, Magic or Lorcana folder found to watch.")
+        return
+    watcher = create_folder_watcher(directories)
+    vision_executor = ThreadPoolExecutor(max_workers=max(1, settings['workers']))
+    magic_executor = ThreadPoolExecutor(max_workers=1)
+    in_flight = set()
+    in_flight_lock = threading.Lock()
+    pending = {}
+    
+    def finished(paths):
+        with in_flight_lock:
+            in_flight.difference_update(paths)
+    
+    def run_cards(game, image_paths):
+        try:
+            process_card_files(image_paths, game, api_key)
+        finally:
+            finished(image_paths)
+    
+    def dispatch(ready):
+        magic_batches = {}
+        for path in ready:
+            root = os.path.dirname(path)
+            game_directory = next((directory for directory in directories
+                                   if os.path.normcase(os.path.abspath(root)).startswith(os.path.normcase(os.path.abspath(directory)) + os.sep)), None)
+            if game_directory is None or (shard is not None and not shard.owns(game_directory, path)):
+                continue
+            game = game_folders[game_directory]
+            with in_flight_lock:
+                if path in in_flight:
+                    continue
+            # Cards renamed in place on their way to Processed show up as new files for a moment
+            with file_lock:
+                if normalized_path(path) in renamed_in_place or not os.path.exists(path):
+                    continue
+            try:
+                image_path = os.path.join(root, preprocess_file(root, os.path.basename(path)))
+            except OSError as e:
+                logging.error(f"Could not prepare {path}: {e}")
+                continue
+            with in_flight_lock:
+                in_flight.update([path, image_path])
+            if image_path != path:
+                finished([path])
+            logging.info(f"Detected new {game} card {image_path}")
+            if game == 'magic':
+                magic_batches.setdefault(root, []).append(image_path)
+            else:
+                vision_executor.submit(run_cards, game, [image_path])
+        batch_size = max(1, settings['ocr_batch_size'])
+        for root, image_paths in magic_batches.items():
+            for start in range(0, len(image_paths), batch_size):
+                magic_executor.submit(run_cards, 'magic', image_paths[start:start + batch_size])
     
-    if os.path.exists(magic_folder):
-        logging.info("Magic folder detected. Running EasyOCR script.")
-        preprocess_file_names(magic_folder)
-        no_new_files = process_magic_directory(magic_folder) and no_new_files
+    print(f"Watching {', '.join(directories)} for new cards. Press Ctrl+C to stop.")
+    logging.info(f"Watch mode started on {', '.join(directories)}")
+    settle = settings['watch_settle_seconds']
+    try:
+        pending.update(dict.fromkeys(watcher.start()))
+        while True:
+            pending.update(dict.fromkeys(watcher.poll(min(1.0, settle) if pending else settings['watch_poll_interval'])))
+            
+            # A file is ready once its size and mtime have stopped changing for the settle time
+            now = time.monotonic()
+            ready = []
+            for path, seen in list(pending.items()):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    del pending[path]
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if seen is None and stat.st_size > 0 and time.time() - stat.st_mtime >= settle:
+                    del pending[path]
+                    ready.append(path)
+                elif seen is None or seen[0] != signature:
+                    pending[path] = (signature, now)
+                elif stat.st_size > 0 and now - seen[1] >= settle:
+                    del pending[path]
+                    ready.append(path)
+            if ready:
+                dispatch(sorted(ready))
+            # With no card in flight every journalled operation has finished, so the journal is emptied
+            # instead of growing for as long as the watcher runs
+            if operation_journal is not None:
+                with in_flight_lock:
+                    if not in_flight:
+                        operation_journal.truncate()
+    except KeyboardInterrupt:
+        print("Stopping watch mode, finishing cards in progress...")
+        logging.info("Watch mode stopping")
+    finally:
+        watcher.close()
+        magic_executor.shutdown(wait=True)
+        vision_executor.shutdown(wait=True)
+
+def run_counters():
+    return {
+        'magic_processed': magic_processed_count,
+        'pokemon_processed': pokemon_processed_count,
+        'lorcana_processed': lorcana_processed_count,
+        'errors': error_files_count,
+        'fixed': fixed_files_count,
+        'duplicates': duplicate_images_count,
+        'scryfall_local_matches': scryfall_local_matches,
+        'scryfall_online_lookups': scryfall_online_lookups,
+        'cache_hits': identification_cache.hits if identification_cache is not None else 0,
+        'cache_misses': identification_cache.misses if identification_cache is not None else 0,
+        'upload_bytes_original': original_upload_bytes,
+        'upload_bytes_sent': sent_upload_bytes,
+        **{f"{game}_{recognizer}_{outcome}": count for (game, recognizer, outcome), count in sorted(recognition_outcomes.items())},
+    }
+
+def write_file_atomically(path, content):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as output_file:
+        output_file.write(content)
+    os.replace(temporary_path, path)
+
+def write_run_report(path):
+    report = {
+        'started_at': run_started_at.isoformat(),
+        'finished_at': datetime.now(timezone.utc).isoformat(),
+        'elapsed_seconds': time.perf_counter() - script_start_time,
+        'time_to_first_card_seconds': first_card_time,
+        'shard': str(shard) if shard is not None else None,
+        'counters': run_counters(),
+        'stages': stage_statistics(),
+    }
+    write_file_atomically(path, json.dumps(report, indent=2))
+
+def bucket_percentile(buckets, count, fraction, maximum):
+    # Upper bound of the first latency bucket holding the requested fraction of the samples
+    for bound, bucket_count in buckets.items():
+        if bucket_count >= fraction * count:
+            return min(float(bound), maximum)
+    return maximum
+
+def merge_run_reports(report_files):
+    # Combines the reports written by the shards of one run. Counters add up; the raw latency samples
+    # are not kept, so percentiles are estimated from the merged buckets.
+    merged = {'shards': [], 'started_at': None, 'finished_at': None, 'elapsed_seconds': 0.0,
+              'time_to_first_card_seconds': None, 'counters': Counter(), 'stages': []}
+    stages = {}
+    for report_file in report_files:
+        with open(report_file, 'r', encoding='utf-8') as file:
+            report = json.load(file)
+        merged['shards'].append(report.get('shard') or report_file)
+        # Timestamps are ISO 8601 in UTC, so they order correctly as strings
+        if merged['started_at'] is None or report['started_at'] < merged['started_at']:
+            merged['started_at'] = report['started_at']
+        if merged['finished_at'] is None or report['finished_at'] > merged['finished_at']:
+            merged['finished_at'] = report['finished_at']
+        merged['elapsed_seconds'] = max(merged['elapsed_seconds'], report['elapsed_seconds'])
+        first_card = report['time_to_first_card_seconds']
+        if first_card is not None and (merged['time_to_first_card_seconds'] is None or first_card < merged['time_to_first_card_seconds']):
+            merged['time_to_first_card_seconds'] = first_card
+        merged['counters'].update(report['counters'])
+        for stage in report['stages']:
+            total = stages.setdefault((stage['stage'], stage['game']), {
+                'stage': stage['stage'], 'game': stage['game'], 'count': 0, 'total_seconds': 0.0,
+                'max_seconds': 0.0, 'buckets': Counter()})
+            total['count'] += stage['count']
+            total['total_seconds'] += stage['total_seconds']
+            total['max_seconds'] = max(total['max_seconds'], stage['max_seconds'])
+            total['buckets'].update(stage['buckets'])
+    for key, stage in sorted(stages.items()):
+        buckets = {str(bound): stage['buckets'][str(bound)] for bound in LATENCY_BUCKETS}
+        stage.update({
+            'mean_seconds': stage['total_seconds'] / stage['count'] if stage['count'] else 0.0,
+            'p50_seconds': bucket_percentile(buckets, stage['count'], 0.50, stage['max_seconds']),
+            'p90_seconds': bucket_percentile(buckets, stage['count'], 0.90, stage['max_seconds']),
+            'p99_seconds': bucket_percentile(buckets, stage['count'], 0.99, stage['max_seconds']),
+            'buckets': buckets,
+        })
+        merged['stages'].append(stage)
+    merged['counters'] = dict(merged['counters'])
+    return merged
+
+def print_merged_summary(report):
+    counters = report['counters']
+    lines = [
+        f"Merged run reports from {len(report['shards'])} shard(s): {', '.join(report['shards'])}",
+        f"Total Magic files processed: {counters.get('magic_processed', 0)}",
+        f"Total Pokemon files processed: {counters.get('pokemon_processed', 0)}",
+        f"Total Lorcana files processed: {counters.get('lorcana_processed', 0)}",
+        f"Errors during processing: {counters.get('errors', 0)}",
+        f"Total fixed files: {counters.get('fixed', 0)}",
+        f"Longest shard: {report['elapsed_seconds']:.1f}s",
+    ]
+    for line in lines:
+        print(line)
+        logging.info(line)
 
-    if os.path.exists(lorcana_folder):
-        logging.info("Lorcana folder detected. Running OpenAI submission script.")
-        preprocess_file_names(lorcana_folder)
-        no_new_files = process_lorcana_directory(lorcana_folder, api_key) and no_new_files
+def prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
 
+def write_prometheus_textfile(path):
+    lines = [
+        '# HELP tcg_stage_duration_seconds Time spent in each processing stage.',
+        '# TYPE tcg_stage_duration_seconds histogram',
+    ]
+    for stage in stage_statistics():
+        labels = f'stage="{prometheus_label(stage["stage"])}",game="{prometheus_label(stage["game"])}"'
+        for bound, count in stage['buckets'].items():
+            lines.append(f'tcg_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'tcg_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {stage["count"]}')
+        lines.append(f'tcg_stage_duration_seconds_sum{{{labels}}} {stage["total_seconds"]:.6f}')
+        lines.append(f'tcg_stage_duration_seconds_count{{{labels}}} {stage["count"]}')
+    for name, value in run_counters().items():
+        lines.append(f'# TYPE tcg_{name}_total counter')
+        lines.append(f'tcg_{name}_total {value}')
+    lines.append('# TYPE tcg_run_duration_seconds gauge')
+    lines.append(f'tcg_run_duration_seconds {time.perf_counter() - script_start_time:.3f}')
+    write_file_atomically(path, '\n'.join(lines) + '\n')
+
+def log_stage_timings():
+    for stage in stage_statistics():
+        logging.info(
+            f"Stage {stage['stage']} ({stage['game']}): {stage['count']} calls, "
+            f"{stage['total_seconds']:.2f}s total, p50 {stage['p50_seconds'] * 1000:.0f}ms, "
+            f"p99 {stage['p99_seconds'] * 1000:.0f}ms"
+        )
+
+def finish_run():
+    log_stage_timings()
+    try:
+        if settings['report_file']:
+            write_run_report(settings['report_file'])
+        if settings['prometheus_textfile']:
+            write_prometheus_textfile(settings['prometheus_textfile'])
+    except OSError as e:
+        logging.error(f"Could not write run report: {e}")
+    close_retry_queue()
+    close_operation_journal()
+    close_identification_cache()
+
+def print_recognizer_stats():
+    # Success rate and latency of every recognizer, per game, to help choose the fastest acceptable one
+    latencies = {(stage['stage'], stage['game']): stage for stage in stage_statistics()}
+    for game, name in sorted({(game, name) for game, name, _ in recognition_outcomes}):
+        hits, misses = recognition_outcomes[(game, name, 'hit')], recognition_outcomes[(game, name, 'miss')]
+        latency = latencies.get((f"recognizer {name}", game))
+        message = f"{game.capitalize()} cards via {name}: {hits} of {hits + misses} identified ({hits / (hits + misses):.0%})"
+        if latency:
+            message += f", p50 {latency['p50_seconds'] * 1000:.0f}ms, p99 {latency['p99_seconds'] * 1000:.0f}ms per card"
+        print(message)
+        logging.info(message)
+
+def print_summary():
     print(f"Total Magic files processed: {magic_processed_count}")
     print(f"Total Pokemon files processed: {pokemon_processed_count}")
     print(f"Total Lorcana files processed: {lorcana_processed_count}")
     print(f"Errors during processing: {error_files_count}")
-    
+    print_cache_stats()
+    if first_card_time is not None:
+        print(f"Time to first card: {first_card_time:.2f}s")
+    if original_upload_bytes:
+        upload_message = f"Uploaded {sent_upload_bytes / 1048576:.1f} MB of images ({original_upload_bytes / 1048576:.1f} MB on disk)"
+        print(upload_message)
+        logging.info(upload_message)
+    if memory_budget.peak:
+        memory_message = f"Peak image memory in flight: {memory_budget.peak / 1048576:.1f} MB (limit {settings['max_inflight_mb']} MB)"
+        print(memory_message)
+        logging.info(memory_message)
+    if duplicate_images_count:
+        duplicate_message = f"Near-duplicate images identified from an earlier copy: {duplicate_images_count} (API calls or OCR runs saved)"
+        print(duplicate_message)
+        logging.info(duplicate_message)
+    print_recognizer_stats()
+    if settings['scryfall_bulk_file']:
+        print(f"Scryfall lookups: {scryfall_local_matches} resolved locally, {scryfall_online_lookups} online")
+        logging.info(f"Scryfall lookups: {scryfall_local_matches} resolved locally, {scryfall_online_lookups} online")
+
     logging.info(f"Total Magic files processed: {magic_processed_count}")
     logging.info(f"Total Pokemon files processed: {pokemon_processed_count}")
     logging.info(f"Total Lorcana files processed: {lorcana_processed_count}")
     logging.info(f"Errors during processing: {error_files_count}")
 
-    if error_files_count > 0:
-        response = input("Auto-TCG-Renamer detected files in your Error folders.\nWould you like to re-check these files using OpenAI? (Y/N): ")
-        if response.lower() in ['n', 'no']:
-            print("Exiting gracefully.")
-            logging.info("Exiting gracefully.")
-            sys.exit(0)
+GAMES = ['pokemon', 'magic', 'lorcana']
+DEFAULT_GAME_FOLDERS = {'pokemon': "Pokemon", 'magic': "Magic", 'lorcana': "Lorcana"}
+STATE_FILE_SETTINGS = ['cache_file', 'journal_file', 'retry_queue_file', 'batch_state_file', 'report_file', 'prometheus_textfile']
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Identify, rename and sort trading card images.")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running and process new images as they are dropped into the game folders")
+    for game in GAMES:
+        parser.add_argument(f'--{game}', action='append', metavar='DIR',
+                            help=f"{game.capitalize()} folder to process, may be repeated (default: {DEFAULT_GAME_FOLDERS[game]}). "
+                                 "Once any folder is given, only the folders given are processed")
+    parser.add_argument('--config', default="tcg.cfg", help="Configuration file (default: tcg.cfg)")
+    parser.add_argument('--backend', choices=['realtime', 'batch'],
+                        help="Identify Pokemon and Lorcana cards with one request per card or group, or through the Batch API, "
+                             "instead of following batch_mode")
+    parser.add_argument('--recognizers', action='append', type=parse_recognizers, metavar='GAME=NAMES',
+                        help="Comma-separated recognizers a game tries in order, overriding <game>_recognizers, "
+                             f"e.g. pokemon=card_list,gpt4o (known: {', '.join(recognizers)})")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="List the images that would be processed without renaming, moving or calling any API")
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help="Only process the images in slice i of N (0 <= i < N), so N processes can share one set of folders")
+    parser.add_argument('--shard-key', choices=['path', 'content'], default='path',
+                        help="Assign images to shards by their path inside the game folder (default) or by a hash of their content")
+    parser.add_argument('--non-interactive', action='store_true',
+                        help="Never wait for input: retry due Error files without asking and exit when done")
+    parser.add_argument('--no-retry', action='store_true', help="Skip the retry pass over the Error folders")
+    parser.add_argument('--merge-reports', nargs='+', metavar='REPORT',
+                        help="Merge the run reports written by the shards of a run into one summary and exit")
+    return parser.parse_args()
+
+def parse_recognizers(value):
+    game, separator, names = value.partition('=')
+    if not separator or game not in GAMES + ['retry']:
+        raise argparse.ArgumentTypeError(f"expected GAME=NAMES with GAME one of {', '.join(GAMES + ['retry'])}, got '{value}'")
+    return game, names
+
+def game_roots(args):
+    roots = [(folder, game) for game in GAMES for folder in getattr(args, game) or []]
+    return roots or [(DEFAULT_GAME_FOLDERS[game], game) for game in GAMES]
 
-    logging.info("Reprocessing error files...")
-    print("Reprocessing error files...")
+def configure_shard(args):
+    # Each shard keeps its own cache, journal, retry queue and reports, since SQLite and the
+    # append-only files are not safe to share between machines
+    global shard
+    if args.shard is None:
+        return
+    shard = Shard(*args.shard, key=args.shard_key)
+    name_registry.exclusive = True
+    for name in STATE_FILE_SETTINGS:
+        if settings[name]:
+            settings[name] = shard.file_name(settings[name])
+    logging.info(f"Running as shard {shard}, keyed by {shard.key}")
 
-    if os.path.exists(pokemon_folder):
-        reprocess_error_files(pokemon_folder, api_key)
-    if os.path.exists(magic_folder):
-        reprocess_error_files(magic_folder, api_key)
-    if os.path.exists(lorcana_folder):
-        reprocess_error_files(lorcana_folder, api_key)
+def run_dry(roots):
+    for folder, game in roots:
+        if not os.path.exists(folder):
+            continue
+        manifest = shard_manifest(folder, scan_game_directory(folder))
+        image_count = 0
+        for root, files in manifest.items():
+            for file in files:
+                logging.info(f"Would process {os.path.join(root, file)} as {game}")
+            image_count += len(files)
+        folder_count = sum(1 for files in manifest.values() if files)
+        print(f"{folder}: {image_count} {game} image(s) in {folder_count} folder(s) would be processed"
+              + (f" by shard {shard}" if shard is not None else ""))
+    if os.path.exists(settings['retry_queue_file']):
+        retry_queue_view = RetryQueue(settings['retry_queue_file'])
+        due_count = sum(len(retry_queue_view.due(folder)) for folder, _ in roots if os.path.exists(folder))
+        print(f"Error files due for a retry: {due_count}")
 
-    print(f"Total fixed files: {fixed_files_count}")
-    logging.info(f"Total fixed files: {fixed_files_count}")
+def main():
+    args = parse_arguments()
+    config_file = args.config
+    if args.merge_reports:
+        if os.path.exists(config_file):
+            load_settings(config_file)
+        report = merge_run_reports(args.merge_reports)
+        print_merged_summary(report)
+        if settings['report_file']:
+            write_file_atomically(settings['report_file'], json.dumps(report, indent=2))
+        return
+    
+    logging.info("Script is starting up...")
+    roots = game_roots(args)
+    
+    if args.dry_run:
+        if os.path.exists(config_file):
+            load_settings(config_file)
+        configure_shard(args)
+        run_dry(roots)
+        return
+    
+    api_key = read_api_key(config_file, interactive=not args.non_interactive)
+    load_settings(config_file)
+    if args.backend:
+        settings['batch_mode'] = args.backend == 'batch'
+    for game, names in args.recognizers or []:
+        settings[f"{game}_recognizers"] = names
+    check_recognizers(sorted({game for _, game in roots}) + ['retry'])
+    configure_shard(args)
+    open_identification_cache()
+    open_operation_journal()
+    open_retry_queue([folder for folder, _ in roots])
+    logging.info(f"Startup completed in {time.perf_counter() - script_start_time:.2f}s")
+    
+    if args.watch:
+        run_watch_mode(api_key, {folder: game for folder, game in roots})
+        print_summary()
+        finish_run()
+        return
+    
+    no_new_files = True
+    # A batch left over from an earlier run is always collected before anything new is submitted
+    use_batch = settings['batch_mode'] or os.path.exists(settings['batch_state_file'])
+    vision_folders = []
+
+    for folder, game in roots:
+        if not os.path.exists(folder):
+            continue
+        logging.info(f"{game.capitalize()} folder {folder} detected. Identifying cards with {', '.join(recognizer.name for recognizer in recognizer_chain(game))}.")
+        manifest = preprocess_file_names(folder, shard_manifest(folder, scan_game_directory(folder)))
+        if use_batch and batch_chain(game)[1] is not None:
+            vision_folders.append((folder, game, manifest))
+        else:
+            no_new_files = process_game_directory(folder, game, api_key, manifest) and no_new_files
+
+    if use_batch:
+        logging.info("Running OpenAI batch submission.")
+        no_new_files = run_batch_mode(api_key, vision_folders) and no_new_files
+
+    print_summary()
+    print_retry_queue()
+
+    existing_roots = [folder for folder, _ in roots if os.path.exists(folder)]
+    due_count = sum(len(retry_queue.due(folder)) for folder in existing_roots)
+    if args.no_retry:
+        logging.info("Skipping the retry pass over the Error folders.")
+    elif due_count == 0:
+        logging.info("No files in the Error folders are due for a retry.")
+    else:
+        if not args.non_interactive:
+            response = input(f"Auto-TCG-Renamer found {due_count} file(s) in your Error folders that are due for a retry.\nWould you like to re-check these files using OpenAI? (Y/N): ")
+            if response.lower() in ['n', 'no']:
+                print("Exiting gracefully.")
+                logging.info("Exiting gracefully.")
+                finish_run()
+                sys.exit(0)
+
+        logging.info("Reprocessing error files...")
+        print("Reprocessing error files...")
+
+        for folder in existing_roots:
+            reprocess_error_files(folder, api_key)
+
+        print(f"Total fixed files: {fixed_files_count}")
+        logging.info(f"Total fixed files: {fixed_files_count}")
+    finish_run()
     
     logging.info("Processing complete. Exiting gracefully.")
-    print("Processing complete. Press Enter to exit.")
-    input()
+    if args.non_interactive:
+        print("Processing complete.")
+    else:
+        print("Processing complete. Press Enter to exit.")
+        input()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,91 @@
+# Compares full-frame OCR with title-region OCR (single and batched) on already-named Magic scans.
+#
+# Usage: python benchmarks/ocr_modes.py Magic/SomeSet/Processed [--limit 200]
+#
+# Files in a Processed folder are named after the card, so the file name is used as the expected
+# OCR text. Accuracy is the share of images whose normalized OCR text matches that name exactly.
+
+import argparse
+import difflib
+import importlib.util
+import os
+import re
+import statistics
+import time
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Auto-TCG-Renamer.py')
+
+def load_renamer():
+    spec = importlib.util.spec_from_file_location('auto_tcg_renamer', SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def expected_name(renamer, image_path):
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    stem = re.sub(r'_\d+$', '', stem)
+    return renamer.normalize_card_name(stem)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_mode(renamer, image_paths, ocr_mode, batch_size):
+    latencies = []
+    texts = []
+    for start in range(0, len(image_paths), batch_size):
+        batch = image_paths[start:start + batch_size]
+        started = time.perf_counter()
+        texts.extend(renamer.extract_card_texts(batch, ocr_mode=ocr_mode))
+        elapsed = time.perf_counter() - started
+        latencies.extend([elapsed / len(batch)] * len(batch))
+    
+    exact = 0
+    similarity = []
+    for image_path, text in zip(image_paths, texts):
+        expected = expected_name(renamer, image_path)
+        actual = renamer.normalize_card_name(text or '')
+        # Double-faced cards are named after both faces, but only the front title is printed
+        if actual and (actual == expected or expected.startswith(actual + ' ')):
+            exact += 1
+        similarity.append(difflib.SequenceMatcher(None, actual, expected).ratio())
+    
+    return {
+        'accuracy': exact / len(image_paths),
+        'similarity': statistics.mean(similarity),
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'cards_per_sec': len(image_paths) / sum(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full-frame versus title-region OCR.")
+    parser.add_argument('directory', help="Folder of images named after the card they show")
+    parser.add_argument('--limit', type=int, default=0, help="Only use the first N images")
+    parser.add_argument('--batch-size', type=int, default=8, help="Batch size for the batched title mode")
+    args = parser.parse_args()
+    
+    renamer = load_renamer()
+    image_paths = []
+    for root, _, files in os.walk(args.directory):
+        image_paths.extend(os.path.join(root, file) for file in sorted(files)
+                           if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')))
+    if args.limit:
+        image_paths = image_paths[:args.limit]
+    if not image_paths:
+        print("No images found.")
+        return
+    
+    # Load the model up front so it is not counted against the first mode
+    renamer.get_reader()
+    modes = [('full', 'full', 1), ('title', 'title', 1), (f'title x{args.batch_size}', 'title', args.batch_size)]
+    print(f"{len(image_paths)} images")
+    print(f"{'mode':<12} {'accuracy':>9} {'similarity':>11} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'cards/s':>9}")
+    for label, ocr_mode, batch_size in modes:
+        result = run_mode(renamer, image_paths, ocr_mode, batch_size)
+        print(f"{label:<12} {result['accuracy']:>9.1%} {result['similarity']:>11.3f} {result['mean_ms']:>9.1f} "
+              f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['cards_per_sec']:>9.2f}")
+
+if __name__ == "__main__":
+    main()
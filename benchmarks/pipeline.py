@@ -0,0 +1,361 @@
+# Runs the whole renamer against synthetic cards and local mock Scryfall / chat-completion servers.
+#
+# Usage: python benchmarks/pipeline.py [--cards 50] [--latency-ms 300] [--error-rate 0.02]
+#                                      [--mode grouped:cards_per_request=4] [--json results.json]
+#
+# Synthetic cards are drawn with their title printed in the title bar, at every requested resolution
+# and format, and laid out in Magic/, Pokemon/ and Lorcana/ trees. Each mode runs the real script in a
+# fresh copy of that tree with its own tcg.cfg, so the numbers include start-up, model loading and the
+# file moves. Cards/sec is measured over the whole run; per-card latency comes from the run report.
+# Accuracy compares every card's final file name with the name it was drawn with, matched by content
+# (cards are moved, never rewritten), so a faster mode that files cards wrongly shows up as such.
+
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Auto-TCG-Renamer.py')
+
+CARD_NAMES = {
+    'Magic': ['Lightning Bolt', 'Counterspell', 'Llanowar Elves', 'Serra Angel', 'Dark Ritual',
+              'Giant Growth', 'Wrath of God', 'Shivan Dragon', 'Swords to Plowshares', 'Birds of Paradise'],
+    'Pokemon': ['Pikachu', 'Charizard', 'Bulbasaur', 'Squirtle', 'Mewtwo', 'Gengar', 'Eevee', 'Snorlax'],
+    'Lorcana': ['Mickey Mouse', 'Elsa', 'Stitch', 'Maleficent', 'Ariel', 'Hades', 'Moana', 'Simba'],
+}
+
+# The mock vision model reads a card's name from a row of dark and light cells on the scanner bed below it,
+# large enough to survive downscaling and JPEG re-encoding
+ALL_NAMES = sorted({name for names in CARD_NAMES.values() for name in names})
+CODE_BITS = 8
+
+DEFAULT_MODES = [
+    ('default', {}),
+    ('grouped', {'cards_per_request': '4'}),
+    ('full-ocr', {'ocr_mode': 'full'}),
+]
+
+def draw_card(name, width, height, rng):
+    import cv2
+    import numpy as np
+    # The card sits on a plain scanner bed so the card bounds detection has an edge to find
+    canvas = np.full((height, width, 3), 235, dtype=np.uint8)
+    margin_x, margin_y = width // 12, height // 14
+    card_width, card_height = width - 2 * margin_x, height - 2 * margin_y
+    card = (rng.random((6, 4, 3)) * 200 + 30).astype(np.uint8)
+    card = cv2.resize(card, (card_width, card_height), interpolation=cv2.INTER_CUBIC)
+    cv2.rectangle(card, (0, 0), (card_width - 1, card_height - 1), (20, 20, 20), max(2, card_width // 40))
+
+    # Title bar, matching the region the Magic pipeline crops
+    top, bottom = int(card_height * 0.035), int(card_height * 0.105)
+    left, right = int(card_width * 0.06), int(card_width * 0.94)
+    cv2.rectangle(card, (left, top), (right, bottom), (225, 225, 225), -1)
+    font = cv2.FONT_HERSHEY_DUPLEX
+    scale = (bottom - top) * 0.6 / cv2.getTextSize(name, font, 1, 1)[0][1]
+    scale = min(scale, (right - left) * 0.7 / cv2.getTextSize(name, font, 1, 1)[0][0])
+    thickness = max(1, int(scale * 1.5))
+    text_height = cv2.getTextSize(name, font, scale, thickness)[0][1]
+    cv2.putText(card, name, (left + (right - left) // 30, top + (bottom - top + text_height) // 2),
+                font, scale, (10, 10, 10), thickness, cv2.LINE_AA)
+
+    canvas[margin_y:margin_y + card_height, margin_x:margin_x + card_width] = card
+    code = ALL_NAMES.index(name)
+    for bit, (left, top, right, bottom) in enumerate(code_cells(width, height)):
+        if code >> bit & 1:
+            canvas[top:bottom, left:right] = 20
+    return canvas
+
+def code_cells(width, height):
+    # Cells in the bottom margin, which the title crop and the card bounds never include
+    margin_x, margin_y = width // 12, height // 14
+    cell = (width - 2 * margin_x) // CODE_BITS
+    top, bottom = height - margin_y + margin_y // 4, height - margin_y // 4
+    return [(margin_x + bit * cell + cell // 4, top, margin_x + (bit + 1) * cell - cell // 4, bottom) for bit in range(CODE_BITS)]
+
+def read_card_code(data):
+    import cv2
+    import numpy as np
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    height, width = image.shape
+    code = sum(1 << bit for bit, (left, top, right, bottom) in enumerate(code_cells(width, height))
+               if image[top:bottom, left:right].mean() < 128)
+    return ALL_NAMES[code] if code < len(ALL_NAMES) else None
+
+def file_digest(path):
+    with open(path, 'rb') as image_file:
+        return hashlib.sha256(image_file.read()).hexdigest()
+
+def comparable_name(name):
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+def identified_name(file_name):
+    # 'Pikachu - Benchmark Set_1.jpg' -> 'Pikachu'; Magic cards carry no series
+    stem = re.sub(r'_\d+$', '', os.path.splitext(file_name)[0])
+    return stem.split(' - ')[0]
+
+def score_tree(directory, truth):
+    # truth maps each card's content hash to its drawn name; returns (correct, total)
+    correct = 0
+    for root, _, files in os.walk(directory):
+        if os.path.basename(root) != 'Processed':
+            continue
+        for file in files:
+            expected = truth.get(file_digest(os.path.join(root, file)))
+            if expected and comparable_name(identified_name(file)) == comparable_name(expected):
+                correct += 1
+    return correct, len(truth)
+
+def generate_tree(directory, cards, sizes, formats, sets, seed):
+    import cv2
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    truth = {}
+    variants = list(itertools.product(sizes, formats))
+    for game, names in CARD_NAMES.items():
+        for index in range(cards):
+            name = names[index % len(names)]
+            (width, height), image_format = variants[index % len(variants)]
+            set_folder = os.path.join(directory, game, f"Set{index % sets + 1}")
+            os.makedirs(set_folder, exist_ok=True)
+            path = os.path.join(set_folder, f"IMG_{index:05d}.{image_format}")
+            cv2.imwrite(path, draw_card(name, width, height, rng))
+            truth[os.path.relpath(path, directory)] = name
+    return truth
+
+class MockBackend:
+    """Scryfall and chat-completion endpoints with fixed latency and a random share of 503 errors."""
+
+    def __init__(self, latency, jitter, error_rate, seed):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'bytes_received': 0}
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self):
+        with self.lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    def should_fail(self, size):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_received'] += size
+            failed = self.random.random() < self.error_rate
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            if failed:
+                self.stats['errors'] += 1
+        time.sleep(delay)
+        return failed
+
+    def chat_content(self, payload):
+        # Answers with the name coded on each card; a card whose code did not survive gets null
+        names = [read_card_code(base64.b64decode(part['image_url']['url'].partition(',')[2]))
+                 for part in payload['messages'][-1]['content']
+                 if isinstance(part, dict) and part.get('type') == 'image_url']
+        if len(names) > 1:
+            return json.dumps([{'index': index + 1, 'name': name, 'series': 'Benchmark Set'}
+                               for index, name in enumerate(names)])
+        return '```json\n' + json.dumps({'name': names[0] if names else None, 'series': 'Benchmark Set'}) + '\n```'
+
+    def handler_class(self):
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if backend.should_fail(0):
+                    return self.reply(503, {'object': 'error', 'details': 'mock outage'})
+                if parts.path.endswith('/cards/named'):
+                    text = parse_qs(parts.query).get('fuzzy', [''])[0].strip()
+                    if not text:
+                        return self.reply(404, {'object': 'error', 'details': 'No card found'})
+                    return self.reply(200, {'object': 'card', 'name': text.title()})
+                self.reply(404, {'error': 'unknown endpoint'})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if backend.should_fail(len(body)):
+                    return self.reply(503, {'error': {'message': 'mock outage'}})
+                if not self.path.endswith('/chat/completions'):
+                    return self.reply(404, {'error': {'message': 'unknown endpoint'}})
+                content = backend.chat_content(json.loads(body))
+                self.reply(200, {'choices': [{'message': {'content': content}}],
+                                 'usage': {'total_tokens': 900}})
+
+        return Handler
+
+def parse_mode(text):
+    label, _, assignments = text.partition(':')
+    overrides = {}
+    for assignment in filter(None, assignments.split(',')):
+        key, _, value = assignment.partition('=')
+        overrides[key.strip()] = value.strip()
+    return label, overrides
+
+def run_script(directory):
+    # wait4 reports the child's own peak RSS rather than the maximum over every child so far
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.abspath(SCRIPT_PATH), '--non-interactive', '--no-retry'], cwd=directory,
+                               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    peak_rss = None
+    if resource is not None and hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status) if hasattr(os, 'waitstatus_to_exitcode') else status
+        peak_rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    else:
+        process.wait()
+    return time.perf_counter() - started, peak_rss, process.returncode
+
+def run_mode(label, overrides, template, workdir, backend, base_settings, truth):
+    directory = os.path.join(workdir, label)
+    shutil.copytree(template, directory)
+    config = {'api_key': 'benchmark', 'api_base': f"{backend.url}/v1", 'scryfall_api_base': backend.url,
+              'report_file': 'run_report.json', **base_settings, **overrides}
+    with open(os.path.join(directory, 'tcg.cfg'), 'w') as config_file:
+        config_file.writelines(f"{key}={value}\n" for key, value in config.items())
+
+    backend.reset()
+    elapsed, peak_rss, returncode = run_script(directory)
+    report_path = os.path.join(directory, 'run_report.json')
+    if not os.path.exists(report_path):
+        raise RuntimeError(f"Mode '{label}' exited with code {returncode} without writing a report; see {directory}/log.txt")
+    with open(report_path) as report_file:
+        report = json.load(report_file)
+
+    counters = report['counters']
+    correct, total = score_tree(directory, truth)
+    cards = counters['magic_processed'] + counters['pokemon_processed'] + counters['lorcana_processed']
+    latency = {stage['game']: stage for stage in report['stages'] if stage['stage'] == 'card'}
+    return {
+        'mode': label,
+        'settings': overrides,
+        'cards': cards,
+        'errors': counters['errors'],
+        'elapsed_seconds': elapsed,
+        'cards_per_sec': cards / elapsed if elapsed else 0.0,
+        'correct': correct,
+        'accuracy': correct / total if total else 0.0,
+        'latency': {game: {'p50_seconds': stage['p50_seconds'], 'p99_seconds': stage['p99_seconds']}
+                    for game, stage in latency.items()},
+        'peak_rss_bytes': peak_rss,
+        'bytes_uploaded': backend.stats['bytes_received'],
+        'requests': backend.stats['requests'],
+        'injected_errors': backend.stats['errors'],
+    }
+
+def print_results(results):
+    print(f"{'mode':<12} {'cards':>6} {'errors':>6} {'accuracy':>9} {'cards/s':>8} {'peak RSS MB':>12} {'uploaded MB':>12} {'requests':>9}")
+    for result in results:
+        peak_rss = f"{result['peak_rss_bytes'] / 1048576:.0f}" if result['peak_rss_bytes'] else 'n/a'
+        print(f"{result['mode']:<12} {result['cards']:>6} {result['errors']:>6} {result['accuracy']:>9.1%} {result['cards_per_sec']:>8.2f} "
+              f"{peak_rss:>12} {result['bytes_uploaded'] / 1048576:>12.1f} {result['requests']:>9}")
+        for game, latency in sorted(result['latency'].items()):
+            print(f"    {game:<10} p50 {latency['p50_seconds'] * 1000:>8.0f} ms   p99 {latency['p99_seconds'] * 1000:>8.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the full renamer pipeline against mock backends.")
+    parser.add_argument('--cards', type=int, default=50, help="Synthetic cards per game")
+    parser.add_argument('--sets', type=int, default=2, help="Set folders per game")
+    parser.add_argument('--sizes', default='630x880,1500x2100', help="Comma-separated image resolutions")
+    parser.add_argument('--formats', default='jpg,png', help="Comma-separated image formats")
+    parser.add_argument('--games', default='Magic,Pokemon,Lorcana', help="Game folders to generate")
+    parser.add_argument('--latency-ms', type=float, default=300, help="Mock server response time")
+    parser.add_argument('--jitter-ms', type=float, default=50, help="Random variation of the response time")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of mock requests answered with a 503")
+    parser.add_argument('--mode', action='append', default=[],
+                        help="Extra mode as name:key=value,key=value (tcg.cfg settings); replaces the default modes")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help="tcg.cfg setting applied to every mode")
+    parser.add_argument('--seed', type=int, default=1, help="Seed for the images and the mock servers")
+    parser.add_argument('--workdir', help="Where to build the trees (default: a temporary directory)")
+    parser.add_argument('--keep', action='store_true', help="Keep the working directory afterwards")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    sizes = [tuple(int(part) for part in size.split('x')) for size in args.sizes.split(',')]
+    formats = [image_format.strip().lstrip('.') for image_format in args.formats.split(',')]
+    games = {game.strip() for game in args.games.split(',')}
+    modes = [parse_mode(mode) for mode in args.mode] or DEFAULT_MODES
+    base_settings = parse_mode(f"all:{','.join(args.set)}")[1]
+    # No caches or journals carried over between runs; every mode starts cold
+    base_settings.setdefault('cache_enabled', 'false')
+    # The mock servers have no quota, so the client-side rate limiter would only measure itself
+    base_settings.setdefault('requests_per_minute', '1000000')
+    base_settings.setdefault('tokens_per_minute', '1000000000')
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='tcg-benchmark-')
+    template = os.path.join(workdir, 'template')
+    backend = MockBackend(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.seed).start()
+    try:
+        truth = generate_tree(template, args.cards, sizes, formats, args.sets, args.seed)
+        for game in CARD_NAMES:
+            if game not in games:
+                shutil.rmtree(os.path.join(template, game), ignore_errors=True)
+        # Keyed by content, which stays the same however the script renames and moves a card
+        truth = {file_digest(os.path.join(template, path)): name for path, name in truth.items()
+                 if path.split(os.sep)[0] in games}
+        print(f"{len(truth)} synthetic cards in {workdir}, "
+              f"mock latency {args.latency_ms:.0f} ms, error rate {args.error_rate:.1%}")
+
+        results = []
+        for label, overrides in modes:
+            results.append(run_mode(label, overrides, template, workdir, backend, base_settings, truth))
+        print_results(results)
+        if args.json:
+            with open(args.json, 'w') as json_file:
+                json.dump({'arguments': vars(args), 'results': results}, json_file, indent=2)
+    finally:
+        backend.stop()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
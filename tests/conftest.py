@@ -0,0 +1,22 @@
+# The renamer is a single script rather than a package, so the tests load it by path.
+# Importing it starts the log listener and opens log.txt in the working directory,
+# which is moved to a scratch directory first.
+
+import importlib.util
+import os
+
+import pytest
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Auto-TCG-Renamer.py')
+
+@pytest.fixture(scope='session')
+def renamer(tmp_path_factory):
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('renamer'))
+    try:
+        spec = importlib.util.spec_from_file_location('auto_tcg_renamer', SCRIPT_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(previous)
+    return module
@@ -0,0 +1,177 @@
+import base64
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+IMAGE_URL = re.compile(r'"url":\s*"data:[^;]+;base64,([^"]+)"')
+
+class StandInOpenAI:
+    """Local stand-in for the files, batches and chat completions endpoints.
+
+    Cards are recognised by the SHA-256 of the uploaded image. Batches report 'in_progress' on their
+    first status check and 'completed' after that, so a test sees both a pending and a finished poll.
+    """
+
+    def __init__(self, batch_cards, chat_cards=None):
+        self.batch_cards = batch_cards
+        self.chat_cards = chat_cards or {}
+        self.files = {}
+        self.batches = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self.handler_class())
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def identify(self, body, cards):
+        match = IMAGE_URL.search(body)
+        name, series = cards.get(hashlib.sha256(base64.b64decode(match.group(1))).hexdigest(), (None, None))
+        return {'choices': [{'message': {'content': json.dumps({'name': name, 'series': series})}}],
+                'usage': {'total_tokens': 900}}
+
+    def complete(self, batch):
+        output = []
+        for line in self.files[batch['input_file_id']].decode().splitlines():
+            request = json.loads(line)
+            output.append(json.dumps({'custom_id': request['custom_id'], 'error': None, 'response': {
+                'status_code': 200, 'body': self.identify(json.dumps(request['body']), self.batch_cards)}}))
+        batch['output_file_id'] = self.store('\n'.join(output).encode())
+        batch['status'] = 'completed'
+
+    def store(self, data):
+        file_id = f"file-{next(self.ids)}"
+        self.files[file_id] = data
+        return file_id
+
+    def handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with stand_in.lock:
+                    stand_in.requests.append(('POST', self.path))
+                    if self.path == '/v1/files':
+                        form = BytesParser(policy=default_policy).parsebytes(
+                            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+                        parts = {part.get_param('name', header='content-disposition'): part.get_payload(decode=True)
+                                 for part in form.iter_parts()}
+                        return self.reply(200, {'id': stand_in.store(parts['file']), 'purpose': parts['purpose'].decode()})
+                    if self.path == '/v1/batches':
+                        request = json.loads(body)
+                        batch_id = f"batch-{next(stand_in.ids)}"
+                        stand_in.batches[batch_id] = {'id': batch_id, 'status': 'validating', 'polls': 0,
+                                                      'input_file_id': request['input_file_id']}
+                        return self.reply(200, {'id': batch_id, 'status': 'validating'})
+                    if self.path == '/v1/chat/completions':
+                        return self.reply(200, stand_in.identify(body.decode(), stand_in.chat_cards))
+                self.reply(404, {'error': {'message': 'unknown endpoint'}})
+
+            def do_GET(self):
+                with stand_in.lock:
+                    stand_in.requests.append(('GET', self.path))
+                    parts = self.path.strip('/').split('/')
+                    if parts[:2] == ['v1', 'batches'] and parts[2] in stand_in.batches:
+                        batch = stand_in.batches[parts[2]]
+                        batch['polls'] += 1
+                        if batch['polls'] == 1:
+                            batch['status'] = 'in_progress'
+                        elif batch['status'] != 'completed':
+                            stand_in.complete(batch)
+                        return self.reply(200, {'id': batch['id'], 'status': batch['status'],
+                                                'output_file_id': batch.get('output_file_id'), 'error_file_id': None,
+                                                'request_counts': {'total': 0, 'completed': 0}})
+                    if parts[:2] == ['v1', 'files'] and parts[-1] == 'content' and parts[2] in stand_in.files:
+                        return self.reply(200, stand_in.files[parts[2]])
+                self.reply(404, {'error': {'message': 'unknown endpoint'}})
+
+        return Handler
+
+def write_card(path, seed):
+    # Distinct bytes per card; the stand-in only looks at their hash
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as image_file:
+        image_file.write(b'\xff\xd8\xff\xe0' + bytes([seed]) * 64 + b'\xff\xd9')
+    with open(path, 'rb') as image_file:
+        return hashlib.sha256(image_file.read()).hexdigest()
+
+@pytest.fixture
+def batch_run(renamer, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    hashes = {name: write_card(str(tmp_path / 'Pokemon' / 'Base' / f"IMG_{seed}.jpg"), seed)
+              for seed, name in enumerate(['Pikachu', 'Charizard', 'Mewtwo'])}
+    stand_in = StandInOpenAI(batch_cards={hashes['Pikachu']: ('Pikachu', 'Base'), hashes['Charizard']: ('Charizard', 'Base')},
+                             chat_cards={hashes['Mewtwo']: ('Mewtwo', 'Base')})
+    cache = renamer.IdentificationCache(str(tmp_path / 'cache.db'), 1000, 30)
+    for key, value in {'api_base': stand_in.url, 'local_vision_api_base': stand_in.url, 'local_vision_model': 'stand-in-vision',
+                       'pokemon_recognizers': 'local_vision,gpt4o', 'upload_format': 'original', 'batch_poll_interval': 0,
+                       'batch_state_file': str(tmp_path / 'batch_state.json')}.items():
+        monkeypatch.setitem(renamer.settings, key, value)
+    monkeypatch.setattr(renamer, 'identification_cache', cache)
+    yield tmp_path, hashes, stand_in, cache
+    cache.close()
+    stand_in.close()
+
+def test_batch_submit_resume_and_collect(renamer, batch_run, monkeypatch):
+    tmp_path, hashes, stand_in, cache = batch_run
+    folders = [(str(tmp_path / 'Pokemon'), 'pokemon', None)]
+
+    # First run: local_vision identifies Mewtwo on the spot, the rest are submitted and left waiting
+    monkeypatch.setitem(renamer.settings, 'batch_wait', False)
+    renamer.run_batch_mode('test-key', folders)
+    processed = tmp_path / 'Pokemon' / 'Base' / 'Processed'
+    assert sorted(os.listdir(processed)) == ['Mewtwo - Base.jpg']
+    assert os.path.exists(renamer.settings['batch_state_file'])
+    state = renamer.load_batch_state()
+    assert len(state['cards']) == 2
+    assert {card['recognizer'] for card in state['cards'].values()} == {'gpt4o'}
+
+    # Second run resumes the same batch instead of submitting again, then collects it
+    monkeypatch.setitem(renamer.settings, 'batch_wait', True)
+    renamer.run_batch_mode('test-key', [])
+    assert sorted(os.listdir(processed)) == ['Charizard - Base.jpg', 'Mewtwo - Base.jpg', 'Pikachu - Base.jpg']
+    assert not os.path.exists(renamer.settings['batch_state_file'])
+    assert not any(name.startswith('batch_input_') for name in os.listdir(tmp_path))
+    assert sum(1 for method, path in stand_in.requests if path == '/v1/batches') == 1
+
+    # Batch results are labelled like online results of the same recognizer
+    labels = dict(cache.connection.execute("SELECT name, backend FROM cards"))
+    assert labels == {'Mewtwo': 'stand-in-vision', 'Pikachu': renamer.settings['vision_model'],
+                      'Charizard': renamer.settings['vision_model']}
+
+def test_batch_miss_goes_to_error(renamer, batch_run, monkeypatch):
+    tmp_path, hashes, stand_in, cache = batch_run
+    del stand_in.batch_cards[hashes['Charizard']]
+    renamer.run_batch_mode('test-key', [(str(tmp_path / 'Pokemon'), 'pokemon', None)])
+    base = tmp_path / 'Pokemon' / 'Base'
+    assert sorted(os.listdir(base / 'Processed')) == ['Mewtwo - Base.jpg', 'Pikachu - Base.jpg']
+    assert os.listdir(base / 'Error') == ['IMG_1.jpg']
@@ -0,0 +1,47 @@
+import os
+
+def test_cards_renamed_in_place_are_marked_until_moved(renamer, tmp_path):
+    # Watch mode skips these, or the renamed copy would be processed a second time
+    source = tmp_path / 'IMG_0001.jpg'
+    source.write_bytes(b'card')
+    renamed = renamer.rename_card_image(str(source), 'Pikachu - Base')
+    assert os.path.basename(renamed) == 'Pikachu - Base.jpg'
+    assert renamer.normalized_path(renamed) in renamer.renamed_in_place
+
+    moved = renamer.move_file(renamed, str(tmp_path / 'Processed'))
+    assert os.path.exists(moved)
+    assert renamer.normalized_path(renamed) not in renamer.renamed_in_place
+
+def test_name_only_card_list_files_cards_by_name(renamer, tmp_path):
+    card_list = tmp_path / 'cards.json'
+    card_list.write_text('["Pikachu", {"name": "Charizard"}, {"name": "Mewtwo", "series": "Base"}]')
+    entries = dict(renamer.card_list_entries(str(card_list)))
+    assert entries['Pikachu'] == ('Pikachu', ())
+    assert renamer.choose_series(entries['Pikachu'][1], str(tmp_path / 'Jungle')) == ''
+    assert renamer.choose_series(entries['Mewtwo'][1], str(tmp_path / 'Jungle')) == 'Base'
+    assert renamer.card_file_name('Pikachu', renamer.choose_series((), str(tmp_path))) == 'Pikachu'
+
+def test_name_only_card_list_matches_hit_the_cache(renamer, tmp_path, monkeypatch):
+    cache = renamer.IdentificationCache(str(tmp_path / 'cache.db'), 1000, 30)
+    monkeypatch.setattr(renamer, 'identification_cache', cache)
+    try:
+        for file_name, backend in [('a.jpg', renamer.CardListRecognizer.cache_label), ('b.jpg', 'easyocr-scryfall')]:
+            (tmp_path / file_name).write_bytes(file_name.encode())
+            renamer.remember_identification(renamer.hash_image(str(tmp_path / file_name)), 'Pikachu', '', backend)
+        assert renamer.look_up_card({'path': str(tmp_path / 'a.jpg')}, 'pokemon')['result'] == ('Pikachu', '')
+        # Other series-less entries (Magic names) still do not count for Pokemon
+        assert 'result' not in renamer.look_up_card({'path': str(tmp_path / 'b.jpg')}, 'pokemon')
+    finally:
+        cache.close()
+
+def test_journal_truncate_keeps_appending(renamer, tmp_path):
+    path = str(tmp_path / 'journal.log')
+    journal = renamer.OperationJournal(path, sync_every=1)
+    operation_id = journal.append({'op': 'plan', 'source': 'a.jpg', 'card_name': 'Pikachu'})
+    journal.append({'op': 'done', 'id': operation_id})
+    journal.truncate()
+    assert os.path.getsize(path) == 0
+    # Records written after the truncation are all a recovery would read
+    journal.append({'op': 'plan', 'source': 'b.jpg', 'card_name': 'Mewtwo'})
+    journal.close(truncate=False)
+    assert [record['source'] for record in renamer.read_journal(path)] == ['b.jpg']
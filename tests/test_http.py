@@ -0,0 +1,92 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+class SequenceServer:
+    """Answers requests with the given status codes in order, then `then` for everything after."""
+
+    def __init__(self, statuses, then=200):
+        self.statuses = list(statuses)
+        self.requests = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                    status = server.statuses.pop(0) if server.statuses else then
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                if status == 429:
+                    self.send_header('Retry-After', '0')
+                self.end_headers()
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def fast_retries(renamer, monkeypatch):
+    for key, value in {'circuit_failure_threshold': 2, 'circuit_cooldown': 0.2, 'backoff_base': 0.01,
+                       'backoff_max': 0.05, 'max_retries': 5}.items():
+        monkeypatch.setitem(renamer.settings, key, value)
+
+def test_rate_limited_probe_reopens_the_circuit(renamer, fast_retries):
+    # Two 503s open the circuit; the probe then gets a 429, which must not leave every caller waiting
+    server = SequenceServer([503, 503, 429])
+    statuses = []
+
+    def call():
+        statuses.append(renamer.http_request('GET', server.url).status_code)
+
+    threads = [threading.Thread(target=call, daemon=True) for _ in range(3)]
+    try:
+        threads[0].start()
+        # The others arrive while the circuit is open
+        time.sleep(0.1)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=15)
+        assert not any(thread.is_alive() for thread in threads)
+        assert statuses == [200, 200, 200]
+    finally:
+        server.close()
+
+def test_host_that_never_recovers_gives_up(renamer, fast_retries):
+    # Failed probes count against max_retries, so the call ends with the 500 instead of probing forever
+    server = SequenceServer([], then=500)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(renamer.http_request('GET', server.url).status_code), daemon=True)
+    try:
+        thread.start()
+        thread.join(timeout=15)
+        assert not thread.is_alive()
+        assert result == [500]
+        # The failure that opens the circuit is free; the one before it and every probe use up the five retries
+        assert server.requests == 2 + 5
+    finally:
+        server.close()
+
+def test_probe_released_when_the_request_raises(renamer):
+    breaker = renamer.CircuitBreaker('example.invalid', failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.wait() is True
+    breaker.release_probe()
+    assert breaker.wait() is True
@@ -0,0 +1,103 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+class StandInExecutor:
+    """Runs submitted calls in this process, or fails them like a pool whose worker died."""
+
+    def __init__(self, broken):
+        self.broken = broken
+        self.submitted = 0
+        self.shut_down = False
+
+    def submit(self, function, *args):
+        self.submitted += 1
+        future = Future()
+        if self.broken:
+            future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+        else:
+            future.set_result(([f"text {path}" for path in args[0]], {}))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+def test_broken_ocr_pool_is_restarted(renamer, monkeypatch):
+    executors = [StandInExecutor(broken=True), StandInExecutor(broken=False)]
+    started = iter(executors)
+    monkeypatch.setattr(renamer.OcrProcessPool, 'start_executor', lambda self: next(started))
+    pool = renamer.OcrProcessPool(1, 1)
+    try:
+        assert pool.extract_card_texts(['a.jpg', 'b.jpg']) == ['text a.jpg', 'text b.jpg']
+        assert executors[0].shut_down
+        assert pool.executor is executors[1]
+        # Later batches go straight to the new pool
+        pool.extract_card_texts(['c.jpg'])
+        assert [executor.submitted for executor in executors] == [1, 2]
+    finally:
+        pool.close()
+
+class BrokenPool:
+    processes = 1
+
+    def extract_card_texts(self, image_paths):
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+def test_ocr_engine_failure_is_retryable(renamer, monkeypatch):
+    recognizer = renamer.ScryfallRecognizer('easyocr_scryfall')
+    monkeypatch.setattr(recognizer, 'ocr_pool', BrokenPool(), raising=False)
+    stages = {name: function for name, function, _, _ in recognizer.stages('magic', None)}
+    cards = [{'path': 'Magic/Set1/a.jpg'}, {'path': 'Magic/Set1/b.jpg'}]
+    stages['ocr'](cards)
+    assert [card['failure'] for card in cards] == ['ocr', 'ocr']
+    delay, retries = renamer.RETRY_POLICIES['ocr']
+    assert delay > 0 and retries > 0
+
+def test_undecodable_image_is_unreadable(renamer, tmp_path, monkeypatch):
+    monkeypatch.setitem(renamer.settings, 'ocr_processes', 0)
+    broken = tmp_path / 'broken.jpg'
+    broken.write_bytes(b'not an image')
+    recognizer = renamer.ScryfallRecognizer('easyocr_scryfall')
+    stages = {name: function for name, function, _, _ in recognizer.stages('magic', None)}
+    cards = [{'path': str(broken)}]
+    stages['read'](cards)
+    stages['ocr'](cards)
+    assert cards[0]['failure'] == 'unreadable'
+
+class StandInRecognizer:
+    cache_label = None
+
+    def __init__(self, name, identify):
+        self.name = name
+        self.identify = identify
+        self.calls = 0
+
+    def stages(self, game, api_key):
+        def identify_cards(cards):
+            self.calls += 1
+            self.identify(cards)
+        return [('identify', identify_cards, 1, 8)]
+
+def missing_easyocr(cards):
+    raise ModuleNotFoundError("No module named 'easyocr'")
+
+def identify_all(cards):
+    for card in cards:
+        card['result'] = ('Pikachu', 'Base')
+
+def test_failed_recognizer_escalates_to_the_next(renamer):
+    local = StandInRecognizer('card_list', missing_easyocr)
+    vision = StandInRecognizer('gpt4o', identify_all)
+    cards = [{'path': 'Pokemon/Base/a.jpg'}, {'path': 'Pokemon/Base/b.jpg'}]
+    for _, function, _, _ in renamer.recognition_stages('pokemon', None, [local, vision]):
+        function(cards)
+    assert [card['result'] for card in cards] == [('Pikachu', 'Base')] * 2
+    assert vision.calls == 1
+    assert renamer.recognition_outcomes[('pokemon', 'card_list', 'miss')] >= 2
+
+def test_last_recognizer_failure_reaches_the_pipeline(renamer):
+    local = StandInRecognizer('card_list', missing_easyocr)
+    (_, function, _, _), = renamer.recognition_stages('pokemon', None, [local])
+    with pytest.raises(ModuleNotFoundError):
+        function([{'path': 'Pokemon/Base/a.jpg'}])
@@ -0,0 +1,36 @@
+import json
+import os
+
+def make_error_file(tmp_path):
+    error_folder = tmp_path / 'cards' / 'Pokemon' / 'Base' / 'Error'
+    error_folder.mkdir(parents=True)
+    (error_folder / 'IMG_0001.jpg').write_bytes(b'card')
+    return error_folder / 'IMG_0001.jpg'
+
+def test_entries_match_from_another_working_directory(renamer, tmp_path, monkeypatch):
+    image = make_error_file(tmp_path)
+    queue_file = str(tmp_path / 'retry_queue.json')
+    monkeypatch.chdir(tmp_path / 'cards')
+    first = renamer.RetryQueue(queue_file)
+    first.record_failure(os.path.join('Pokemon', 'Base', 'Error', 'IMG_0001.jpg'), 'network')
+    first.save()
+
+    monkeypatch.chdir(tmp_path)
+    second = renamer.RetryQueue(queue_file)
+    second.entries[renamer.normalized_path(str(image))]['next_attempt'] = 0
+    assert second.due(os.path.join('cards', 'Pokemon')) == [str(image)]
+    second.record_failure(str(image), 'network')
+    assert len(second.entries) == 1
+    assert next(iter(second.entries.values()))['attempts'] == 2
+    second.forget(os.path.join('cards', 'Pokemon', 'Base', 'Error', 'IMG_0001.jpg'))
+    assert second.entries == {}
+
+def test_relative_keys_from_older_queues_are_normalized(renamer, tmp_path, monkeypatch):
+    image = make_error_file(tmp_path)
+    queue_file = tmp_path / 'retry_queue.json'
+    queue_file.write_text(json.dumps({os.path.join('Pokemon', 'Base', 'Error', 'IMG_0001.jpg'): {
+        'attempts': 1, 'size': 4, 'mtime': 0, 'reason': 'network', 'last_attempt': 0, 'next_attempt': 0}}))
+    monkeypatch.chdir(tmp_path / 'cards')
+    queue = renamer.RetryQueue(str(queue_file))
+    assert list(queue.entries) == [renamer.normalized_path(str(image))]
+    assert queue.due(str(tmp_path / 'cards' / 'Pokemon')) == [str(image)]
@@ -0,0 +1,28 @@
+import os
+
+def test_collision_renamed_file_stays_in_its_shard(renamer, tmp_path):
+    # 'foo!.jpg' next to 'foo.jpg' is preprocessed to 'foo_1.jpg'; both forms must hash alike
+    folder = tmp_path / 'Pokemon' / 'Base'
+    folder.mkdir(parents=True)
+    (folder / 'foo.jpg').write_bytes(b'a')
+    (folder / 'foo!.jpg').write_bytes(b'b')
+    raw = str(folder / 'foo!.jpg')
+    renamed = os.path.join(str(folder), renamer.preprocess_file(str(folder), 'foo!.jpg'))
+    assert os.path.basename(renamed) == 'foo_1.jpg'
+
+    directory = str(tmp_path / 'Pokemon')
+    for count in (2, 3, 5, 8):
+        for index in range(count):
+            shard = renamer.Shard(index, count)
+            assert shard.path_key(directory, renamed) == shard.path_key(directory, raw) == shard.path_key(directory, str(folder / 'foo.jpg'))
+            assert shard.owns(directory, renamed) == shard.owns(directory, str(folder / 'foo.jpg'))
+
+def test_numbered_camera_names_keep_their_number(renamer, tmp_path):
+    folder = tmp_path / 'Pokemon' / 'Base'
+    folder.mkdir(parents=True)
+    shard = renamer.Shard(0, 4)
+    directory = str(tmp_path / 'Pokemon')
+    keys = {shard.path_key(directory, str(folder / f"IMG_{number:04d}.jpg")) for number in range(20)}
+    assert len(keys) == 20
+    # Preprocessing strips the underscore; the key is the same before and after
+    assert shard.path_key(directory, str(folder / 'IMG_0001.jpg')) == shard.path_key(directory, str(folder / 'IMG0001.jpg'))